@@ -0,0 +1,188 @@
+import os
+import zlib
+from typing import Dict, List
+
+from dotenv import load_dotenv
+from google.cloud import firestore
+from google.cloud.firestore_v1.field_path import FieldPath
+
+load_dotenv()
+
+# "compact" keeps an aggregate of each user's voices, bits, bans and rate
+# limits next to the subcollections, so settings are read in one round trip
+SETTINGS_LAYOUT = os.getenv("SETTINGS_LAYOUT", "subcollections")
+# bans are spread over this many documents to stay under the 1 MiB limit;
+# changing it needs the migration script to be run again
+SETTINGS_BAN_SHARDS = int(os.getenv("SETTINGS_BAN_SHARDS", 4))
+
+# returned by read() for users whose aggregate has not been built yet
+INCOMPLETE = object()
+
+KINDS = ("voices", "bits", "bans", "rateLimits")
+
+
+def enabled() -> bool:
+    return SETTINGS_LAYOUT == "compact"
+
+
+def writes() -> int:
+    """Aggregate writes staged for each subcollection write."""
+    return 1 if enabled() else 0
+
+
+def items_ref(client, user_id: str):
+    return (
+        client.collection("settings")
+        .document(user_id)
+        .collection("aggregate")
+        .document("items")
+    )
+
+
+def ban_shard_ref(client, user_id: str, shard: int):
+    return (
+        client.collection("settings")
+        .document(user_id)
+        .collection("aggregate")
+        .document(f"bans-{shard}")
+    )
+
+
+def ban_shard(target_user_id: str) -> int:
+    return zlib.crc32(target_user_id.encode()) % SETTINGS_BAN_SHARDS
+
+
+def _ref(client, user_id: str, kind: str, item_id: str):
+    if kind == "bans":
+        return ban_shard_ref(client, user_id, ban_shard(item_id))
+    return items_ref(client, user_id)
+
+
+def stage_set(batch, client, user_id: str, kind: str, item_id: str, data: dict):
+    """Mirror a subcollection ``set`` into the aggregate, in ``batch``."""
+    if enabled():
+        # merging on the item's path replaces just that item
+        batch.set(
+            _ref(client, user_id, kind, item_id),
+            {kind: {item_id: data}},
+            merge=[FieldPath(kind, item_id)],
+        )
+
+
+def stage_update(batch, client, user_id: str, kind: str, item_id: str, fields: dict):
+    """Mirror a subcollection ``update`` into the aggregate, in ``batch``."""
+    if enabled():
+        batch.set(
+            _ref(client, user_id, kind, item_id),
+            {kind: {item_id: fields}},
+            merge=True,
+        )
+
+
+def stage_delete(batch, client, user_id: str, kind: str, item_id: str):
+    """Mirror a subcollection ``delete`` into the aggregate, in ``batch``."""
+    if enabled():
+        batch.set(
+            _ref(client, user_id, kind, item_id),
+            {kind: {item_id: firestore.DELETE_FIELD}},
+            merge=True,
+        )
+
+
+async def read(client, user_id: str):
+    """The settings document with its items from the aggregate.
+
+    One batched get for the settings document, the items document and the
+    ban shards. Returns None if the user has no settings and INCOMPLETE if
+    their aggregate has not been built by the migration yet.
+    """
+    settings_ref = client.collection("settings").document(user_id)
+    refs = [settings_ref, items_ref(client, user_id)] + [
+        ban_shard_ref(client, user_id, shard) for shard in range(SETTINGS_BAN_SHARDS)
+    ]
+
+    docs = {doc.reference.path: doc async for doc in client.get_all(refs)}
+
+    settings = docs.get(settings_ref.path)
+    if settings is None or not settings.exists:
+        return None
+
+    items = docs.get(refs[1].path)
+    if items is None or not items.exists:
+        return INCOMPLETE
+
+    # writes mirrored before the migration create items without the marker
+    items = items.to_dict()
+    if items.get("banShards") != SETTINGS_BAN_SHARDS:
+        return INCOMPLETE
+
+    bans: Dict[str, dict] = {}
+    for ref in refs[2:]:
+        shard = docs.get(ref.path)
+        if shard is not None and shard.exists:
+            bans.update(shard.to_dict().get("bans", {}))
+
+    res = settings.to_dict()
+    res["voices"] = _ordered(items.get("voices", {}))
+    res["bits"] = _ordered(items.get("bits", {}))
+    res["bans"] = _ordered(bans)
+    res["rateLimits"] = _ordered(items.get("rateLimits", {}))
+    return res
+
+
+def _ordered(items: Dict[str, dict]) -> List[dict]:
+    # subcollection reads come back ordered by document id
+    return [items[item_id] for item_id in sorted(items)]
+
+
+def build(subcollections: Dict[str, Dict[str, dict]]) -> Dict[str, dict]:
+    """Aggregate documents, by document id, for ``{kind: {id: data}}``."""
+    docs: Dict[str, dict] = {
+        "items": {
+            "voices": subcollections.get("voices", {}),
+            "bits": subcollections.get("bits", {}),
+            "rateLimits": subcollections.get("rateLimits", {}),
+            "banShards": SETTINGS_BAN_SHARDS,
+        }
+    }
+    for shard in range(SETTINGS_BAN_SHARDS):
+        docs[f"bans-{shard}"] = {"bans": {}}
+    for target_user_id, ban in subcollections.get("bans", {}).items():
+        docs[f"bans-{ban_shard(target_user_id)}"]["bans"][target_user_id] = ban
+    return docs
+
+
+async def stage_rebuild(transaction, client, user_id: str) -> Dict[str, int]:
+    """Rebuild the user's aggregate from their subcollections, in
+    ``transaction``. Returns the number of items of each kind.
+
+    The subcollections are read inside the transaction, so a write to any
+    of them while the aggregate is built makes it retry instead of being
+    lost.
+    """
+    settings_ref = client.collection("settings").document(user_id)
+
+    subcollections = {}
+    for kind in KINDS:
+        subcollections[kind] = {
+            doc.id: doc.to_dict()
+            async for doc in settings_ref.collection(kind).stream(
+                transaction=transaction
+            )
+        }
+
+    stale = [
+        doc.reference
+        async for doc in settings_ref.collection("aggregate").stream(
+            transaction=transaction
+        )
+    ]
+
+    docs = build(subcollections)
+    for ref in stale:
+        if ref.id not in docs:
+            transaction.delete(ref)
+    for doc_id, data in docs.items():
+        transaction.set(settings_ref.collection("aggregate").document(doc_id), data)
+
+    return {kind: len(items) for kind, items in subcollections.items()}
@@ -0,0 +1,139 @@
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import httpx
+from dotenv import load_dotenv
+
+load_dotenv()
+
+AUTH_SERVICE_URL = os.getenv("AUTH_SERVICE_URL")
+
+# seconds a validated code is trusted before asking the auth service again
+AUTH_CACHE_TTL = float(os.getenv("AUTH_CACHE_TTL", 60))
+# seconds a rejected code is remembered, so retries do not all reach it
+AUTH_NEGATIVE_CACHE_TTL = float(os.getenv("AUTH_NEGATIVE_CACHE_TTL", 5))
+AUTH_CACHE_MAX_ENTRIES = int(os.getenv("AUTH_CACHE_MAX_ENTRIES", 10000))
+
+# (status code, response body)
+Validation = Tuple[int, dict]
+
+
+class ValidationCache:
+    """Auth service answers by code digest, least recently used dropped
+    first once ``max_entries`` is reached."""
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[bytes, Tuple[Validation, float]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: bytes) -> Optional[Validation]:
+        entry = self.entries.get(key)
+        if entry is not None:
+            validation, expires = entry
+            if expires > time.monotonic():
+                self.hits += 1
+                self.entries.move_to_end(key)
+                return validation
+            del self.entries[key]
+
+        self.misses += 1
+        return None
+
+    def set(self, key: bytes, validation: Validation, ttl: float):
+        if ttl <= 0:
+            return
+        self.entries[key] = (validation, time.monotonic() + ttl)
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+cache = ValidationCache(AUTH_CACHE_MAX_ENTRIES)
+
+# validations in flight, so concurrent requests with one code share a call
+_inflight: Dict[bytes, asyncio.Future] = {}
+
+_http_client: Optional[httpx.AsyncClient] = None
+_http_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """A pooled client for the auth service, one per event loop."""
+    global _http_client, _http_loop
+
+    loop = asyncio.get_running_loop()
+    if _http_client is None or _http_loop is not loop:
+        _http_client = httpx.AsyncClient()
+        _http_loop = loop
+    return _http_client
+
+
+async def _fetch(code: str) -> Validation:
+    res = await get_http_client().post(
+        f"{AUTH_SERVICE_URL}/validate",
+        headers={"Authorization": f"Bearer {code}"},
+    )
+
+    if res.status_code != 200:
+        logging.error(
+            f"Request to {AUTH_SERVICE_URL}/validate failed with status code {res.status_code} and response {res.text}"
+        )
+
+    if res.status_code in (400, 401):
+        return res.status_code, {}
+
+    return res.status_code, res.json()
+
+
+async def validate(code: str) -> Validation:
+    key = hashlib.sha256(code.encode()).digest()
+
+    validation = cache.get(key)
+    if validation is not None:
+        return validation
+
+    future = _inflight.get(key)
+    if future is not None:
+        return await asyncio.shield(future)
+
+    future = asyncio.get_running_loop().create_future()
+    _inflight[key] = future
+    try:
+        validation = await _fetch(code)
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    except Exception as e:
+        future.set_exception(e)
+        # retrieved here so a failure nobody else waited for is not reported
+        future.exception()
+        raise
+    else:
+        future.set_result(validation)
+    finally:
+        del _inflight[key]
+
+    status_code = validation[0]
+    if status_code == 200:
+        cache.set(key, validation, AUTH_CACHE_TTL)
+    elif status_code in (400, 401):
+        cache.set(key, validation, AUTH_NEGATIVE_CACHE_TTL)
+
+    return validation
+
+
+def clear():
+    cache.clear()
+    _inflight.clear()
@@ -1,30 +1,51 @@
 from flask import g, request
-from google.cloud import firestore
+
+from ..db import ChunkedWriteBatch, get_client, missing_documents
 
 super_admin = "super_admin"
 admin = "admin"
 
 
-async def add_admins():
-    user_id = g.user_id
-
-    client = firestore.AsyncClient()
-
+def _admins_from_request():
     admins = request.json.get("admins")
 
     if not admins:
-        return {"error": "Admins are required"}, 400
+        return None, ({"error": "Admins are required"}, 400)
 
     if not isinstance(admins, (dict, list)):
-        return {"error": "Admins must be a list or a single object"}, 400
+        return None, ({"error": "Admins must be a list or a single object"}, 400)
 
     if isinstance(admins, dict):
         admins = [admins]
 
-    for admin in admins:
-        username = admin.get("username", "")
-        target_user_id = admin.get("user_id", "")
-        admin_type = admin.get("admin_type", admin)
+    if not all(isinstance(entry, dict) for entry in admins):
+        return None, ({"error": "Admins must be a list or a single object"}, 400)
+
+    return admins, None
+
+
+def _admin_ref(client, user_id, target_user_id):
+    return (
+        client.collection("settings")
+        .document(user_id)
+        .collection("admins")
+        .document(target_user_id)
+    )
+
+
+async def add_admins():
+    user_id = g.user_id
+
+    client = get_client()
+
+    admins, error = _admins_from_request()
+    if error:
+        return error
+
+    for entry in admins:
+        username = entry.get("username", "")
+        target_user_id = entry.get("user_id", "")
+        admin_type = entry.get("admin_type", admin)
 
         if (
             not username
@@ -35,11 +56,17 @@ async def add_admins():
         ):
             return {"error": "Username and user_id must be strings"}, 400
 
-        await client.collection("settings").document(user_id).collection(
-            "admins"
-        ).document(target_user_id).set(
-            {"username": username, "user_id": target_user_id, "admin_type": admin_type}
+    batch = ChunkedWriteBatch(client)
+    for entry in admins:
+        batch.set(
+            _admin_ref(client, user_id, entry["user_id"]),
+            {
+                "username": entry["username"],
+                "user_id": entry["user_id"],
+                "admin_type": entry.get("admin_type", admin),
+            },
         )
+    await batch.commit()
 
     return {"message": "Admins added"}, 200
 
@@ -47,39 +74,28 @@ async def add_admins():
 async def delete_admins():
     user_id = g.user_id
 
-    client = firestore.AsyncClient()
-
-    admins = request.json.get("admins")
-
-    if not admins:
-        return {"error": "Admins are required"}, 400
+    client = get_client()
 
-    if not isinstance(admins, (dict, list)):
-        return {"error": "Admins must be a list or a single object"}, 400
+    admins, error = _admins_from_request()
+    if error:
+        return error
 
-    if isinstance(admins, dict):
-        admins = [admins]
-
-    for admin in admins:
-
-        target_user_id = admin.get("user_id")
+    for entry in admins:
+        target_user_id = entry.get("user_id")
 
         if not target_user_id or not isinstance(target_user_id, str):
             return {"error": "User ID is required and must be a string"}, 400
 
-        admin_doc_ref = (
-            client.collection("settings")
-            .document(user_id)
-            .collection("admins")
-            .document(target_user_id)
-        )
-
-        admin_ref = await admin_doc_ref.get()
+    refs = [_admin_ref(client, user_id, entry["user_id"]) for entry in admins]
 
-        if not admin_ref.exists:
-            return {"error": "Admin not found"}, 404
+    missing = await missing_documents(client, refs)
+    if missing:
+        return {"error": "Admin not found", "user_ids": missing}, 404
 
-        await admin_doc_ref.delete()
+    batch = ChunkedWriteBatch(client)
+    for ref in refs:
+        batch.delete(ref)
+    await batch.commit()
 
     return {"message": "Admins deleted"}, 200
 
@@ -87,21 +103,15 @@ async def delete_admins():
 async def update_admins():
     user_id = g.user_id
 
-    client = firestore.AsyncClient()
+    client = get_client()
 
-    admins = request.json.get("admins")
-    if not admins:
-        return {"error": "Admins are required"}, 400
+    admins, error = _admins_from_request()
+    if error:
+        return error
 
-    if not isinstance(admins, (dict, list)):
-        return {"error": "Admins must be a list or a single object"}, 400
-
-    if isinstance(admins, dict):
-        admins = [admins]
-
-    for admin in admins:
-        target_user_id = admin.get("user_id")
-        admin_type = admin.get("admin_type")
+    for entry in admins:
+        target_user_id = entry.get("user_id")
+        admin_type = entry.get("admin_type")
 
         if not target_user_id or not isinstance(target_user_id, str):
             return {"error": "User ID is required and must be a string"}, 400
@@ -117,19 +127,16 @@ async def update_admins():
         ):
             return {"error": "Admin type is required and must be a string"}, 400
 
-        admin_doc_ref = (
-            client.collection("settings")
-            .document(user_id)
-            .collection("admins")
-            .document(target_user_id)
-        )
-
-        admin_ref = await admin_doc_ref.get()
+    refs = [_admin_ref(client, user_id, entry["user_id"]) for entry in admins]
 
-        if not admin_ref.exists:
-            return {"error": "Admin not found"}, 404
+    missing = await missing_documents(client, refs)
+    if missing:
+        return {"error": "Admin not found", "user_ids": missing}, 404
 
-        await admin_doc_ref.update({"admin_type": admin_type})
+    batch = ChunkedWriteBatch(client)
+    for ref, entry in zip(refs, admins):
+        batch.update(ref, {"admin_type": entry["admin_type"]})
+    await batch.commit()
 
     return {"message": "Admins updated"}, 200
 
@@ -137,7 +144,7 @@ async def update_admins():
 async def get_admins():
     user_id = g.user_id
 
-    client = firestore.AsyncClient()
+    client = get_client()
 
     admins = (
         await client.collection("settings").document(user_id).collection("admins").get()
@@ -1,11 +1,14 @@
 from flask import g, request
-from google.cloud import firestore
+
+from .. import aggregate
+from ..db import ChunkedWriteBatch, get_client, missing_documents
+from ..snapshots import settings_snapshots
 
 
 async def get_bans():
     user_id = g.user_id
 
-    client = firestore.AsyncClient()
+    client = get_client()
 
     bans = (
         await client.collection("settings").document(user_id).collection("bans").get()
@@ -17,7 +20,7 @@ async def get_bans():
 async def get_ban(target_user_id: str):
     user_id = g.user_id
 
-    client = firestore.AsyncClient()
+    client = get_client()
 
     ban = (
         await client.collection("settings")
@@ -39,7 +42,7 @@ async def get_ban(target_user_id: str):
 async def add_ban():
     user_id = g.user_id
 
-    client = firestore.AsyncClient()
+    client = get_client()
 
     target_user_id = request.json.get("user_id")
     expiration = request.json.get("expiration", -1)
@@ -60,7 +63,14 @@ async def add_ban():
         .document(target_user_id)
     )
 
-    await ref.set({"expiration": expiration})
+    data = {"expiration": expiration}
+
+    batch = client.batch()
+    batch.set(ref, data)
+    aggregate.stage_set(batch, client, user_id, "bans", target_user_id, data)
+    await batch.commit()
+
+    settings_snapshots.invalidate(user_id)
 
     return {"id": ref.id, "message": "Ban added"}, 201
 
@@ -68,16 +78,26 @@ async def add_ban():
 async def delete_ban():
     user_id = g.user_id
 
-    client = firestore.AsyncClient()
+    client = get_client()
 
     target_user_id = request.json.get("user_id")
 
     if not target_user_id or not isinstance(target_user_id, str):
         return {"error": "User ID is required and must be a string"}, 400
 
-    await client.collection("settings").document(user_id).collection("bans").document(
-        target_user_id
-    ).delete()
+    ref = (
+        client.collection("settings")
+        .document(user_id)
+        .collection("bans")
+        .document(target_user_id)
+    )
+
+    batch = client.batch()
+    batch.delete(ref)
+    aggregate.stage_delete(batch, client, user_id, "bans", target_user_id)
+    await batch.commit()
+
+    settings_snapshots.invalidate(user_id)
 
     return {"message": "Ban deleted"}, 200
 
@@ -85,7 +105,7 @@ async def delete_ban():
 async def update_ban():
     user_id = g.user_id
 
-    client = firestore.AsyncClient()
+    client = get_client()
 
     target_user_id = request.json.get("user_id")
     expiration = request.json.get("expiration")
@@ -99,8 +119,139 @@ async def update_ban():
     if expiration < -1:
         return {"error": "Expiration must be greater than or equal to -1"}, 400
 
-    await client.collection("settings").document(user_id).collection("bans").document(
-        target_user_id
-    ).update({"expiration": expiration})
+    ref = (
+        client.collection("settings")
+        .document(user_id)
+        .collection("bans")
+        .document(target_user_id)
+    )
+    fields = {"expiration": expiration}
+
+    batch = client.batch()
+    batch.update(ref, fields)
+    aggregate.stage_update(batch, client, user_id, "bans", target_user_id, fields)
+    await batch.commit()
+
+    settings_snapshots.invalidate(user_id)
 
     return {"message": "Ban updated"}, 200
+
+
+def _ban_ref(client, user_id, target_user_id):
+    return (
+        client.collection("settings")
+        .document(user_id)
+        .collection("bans")
+        .document(target_user_id)
+    )
+
+
+def _bans_from_request(default_expiration=None, with_expiration=True):
+    """Validated ``(target_user_id, expiration)`` pairs from ``{"bans": [...]}``,
+    or an error response."""
+    bans = request.json.get("bans")
+
+    if not bans or not isinstance(bans, list):
+        return None, ({"error": "Bans are required and must be a list"}, 400)
+
+    parsed = []
+    for ban in bans:
+        if not isinstance(ban, dict):
+            return None, ({"error": "Each ban must be an object"}, 400)
+
+        target_user_id = ban.get("user_id")
+        expiration = ban.get("expiration", default_expiration)
+
+        if not target_user_id or not isinstance(target_user_id, str):
+            return None, ({"error": "User ID is required and must be a string"}, 400)
+
+        if not with_expiration:
+            parsed.append((target_user_id, None))
+            continue
+
+        if not isinstance(expiration, int) or isinstance(expiration, bool):
+            return None, ({"error": "Expiration must be an integer"}, 400)
+
+        if expiration < -1:
+            return None, (
+                {"error": "Expiration must be greater than or equal to -1"},
+                400,
+            )
+
+        parsed.append((target_user_id, expiration))
+
+    if len({target_user_id for target_user_id, _ in parsed}) != len(parsed):
+        return None, ({"error": "Each user ID may only appear once"}, 400)
+
+    return parsed, None
+
+
+async def add_bans():
+    user_id = g.user_id
+
+    client = get_client()
+
+    bans, error = _bans_from_request(default_expiration=-1)
+    if error:
+        return error
+
+    batch = ChunkedWriteBatch(client)
+    for target_user_id, expiration in bans:
+        data = {"expiration": expiration}
+        batch.reserve(1 + aggregate.writes())
+        batch.set(_ban_ref(client, user_id, target_user_id), data)
+        aggregate.stage_set(batch, client, user_id, "bans", target_user_id, data)
+    await batch.commit()
+
+    settings_snapshots.invalidate(user_id)
+
+    return {"message": "Bans added", "count": len(bans)}, 201
+
+
+async def update_bans():
+    user_id = g.user_id
+
+    client = get_client()
+
+    bans, error = _bans_from_request()
+    if error:
+        return error
+
+    refs = [_ban_ref(client, user_id, target_user_id) for target_user_id, _ in bans]
+
+    missing = await missing_documents(client, refs)
+    if missing:
+        return {"error": "Ban not found", "user_ids": missing}, 404
+
+    batch = ChunkedWriteBatch(client)
+    for ref, (target_user_id, expiration) in zip(refs, bans):
+        fields = {"expiration": expiration}
+        batch.reserve(1 + aggregate.writes())
+        batch.update(ref, fields)
+        aggregate.stage_update(batch, client, user_id, "bans", target_user_id, fields)
+    await batch.commit()
+
+    settings_snapshots.invalidate(user_id)
+
+    return {"message": "Bans updated", "count": len(bans)}, 200
+
+
+async def delete_bans():
+    user_id = g.user_id
+
+    client = get_client()
+
+    bans, error = _bans_from_request(with_expiration=False)
+    if error:
+        return error
+
+    batch = ChunkedWriteBatch(client)
+    for target_user_id, _ in bans:
+        batch.reserve(1 + aggregate.writes())
+        batch.delete(_ban_ref(client, user_id, target_user_id))
+        aggregate.stage_delete(batch, client, user_id, "bans", target_user_id)
+    await batch.commit()
+
+    settings_snapshots.invalidate(user_id)
+
+    return {"message": "Bans deleted", "count": len(bans)}, 200
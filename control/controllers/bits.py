@@ -1,10 +1,11 @@
 from flask import request
-from google.cloud import firestore
+
+from ..db import get_client
 
 
 async def get_bits():
 
-    client = firestore.AsyncClient()
+    client = get_client()
 
     bits = await client.collection("bits").get()
 
@@ -31,7 +32,7 @@ async def get_bits():
 
 
 async def get_bit(bit_id: str):
-    client = firestore.AsyncClient()
+    client = get_client()
 
     bit = await client.collection("bits").document(bit_id).get()
 
@@ -42,7 +43,7 @@ async def get_bit(bit_id: str):
 
 
 async def add_bit():
-    client = firestore.AsyncClient()
+    client = get_client()
 
     url = request.json.get("url")
     name = request.json.get("name")
@@ -64,7 +65,7 @@ async def add_bit():
 
 
 async def update_bit(bit_id: str):
-    client = firestore.AsyncClient()
+    client = get_client()
 
     bit = request.json
 
@@ -79,7 +80,7 @@ async def update_bit(bit_id: str):
 
 
 async def delete_bit(key: str):
-    client = firestore.AsyncClient()
+    client = get_client()
 
     await client.collection("bits").document(key).delete()
 
@@ -1,11 +1,14 @@
 from flask import g, request
-from google.cloud import firestore
+
+from .. import aggregate
+from ..db import ChunkedWriteBatch, get_client, missing_documents
+from ..snapshots import settings_snapshots
 
 
 async def get_ratelimits():
     user_id = g.user_id
 
-    client = firestore.AsyncClient()
+    client = get_client()
 
     ratelimits = (
         await client.collection("settings")
@@ -22,7 +25,7 @@ async def get_ratelimits():
 async def add_ratelimit():
     user_id = g.user_id
 
-    client = firestore.AsyncClient()
+    client = get_client()
 
     target_user_id = request.json.get("user_id")
     if not target_user_id:
@@ -43,7 +46,14 @@ async def add_ratelimit():
         .document(target_user_id)
     )
 
-    await ref.set(request.json)
+    batch = client.batch()
+    batch.set(ref, request.json)
+    aggregate.stage_set(
+        batch, client, user_id, "rateLimits", target_user_id, request.json
+    )
+    await batch.commit()
+
+    settings_snapshots.invalidate(user_id)
 
     return {"message": "Ratelimit added"}, 201
 
@@ -51,15 +61,25 @@ async def add_ratelimit():
 async def delete_ratelimit():
     user_id = g.user_id
 
-    client = firestore.AsyncClient()
+    client = get_client()
 
     target_user_id = request.json.get("user_id")
     if not target_user_id:
         return {"error": "Target user ID is required"}, 400
 
-    await client.collection("settings").document(user_id).collection(
-        "rateLimits"
-    ).document(target_user_id).delete()
+    ref = (
+        client.collection("settings")
+        .document(user_id)
+        .collection("rateLimits")
+        .document(target_user_id)
+    )
+
+    batch = client.batch()
+    batch.delete(ref)
+    aggregate.stage_delete(batch, client, user_id, "rateLimits", target_user_id)
+    await batch.commit()
+
+    settings_snapshots.invalidate(user_id)
 
     return {"message": "Ratelimit deleted"}, 200
 
@@ -67,7 +87,7 @@ async def delete_ratelimit():
 async def update_ratelimit():
     user_id = g.user_id
 
-    client = firestore.AsyncClient()
+    client = get_client()
 
     target_user_id = request.json.get("user_id")
     if not target_user_id:
@@ -93,6 +113,133 @@ async def update_ratelimit():
     if not doc.exists:
         return {"error": "Ratelimit not found"}, 404
 
-    await ref.update(request.json)
+    batch = client.batch()
+    batch.update(ref, request.json)
+    aggregate.stage_update(
+        batch, client, user_id, "rateLimits", target_user_id, request.json
+    )
+    await batch.commit()
+
+    settings_snapshots.invalidate(user_id)
 
     return {"message": "Ratelimit updated"}, 200
+
+
+def _ratelimit_ref(client, user_id, target_user_id):
+    return (
+        client.collection("settings")
+        .document(user_id)
+        .collection("rateLimits")
+        .document(target_user_id)
+    )
+
+
+def _ratelimits_from_request(with_limits=True):
+    """Validated rate limit objects from ``{"ratelimits": [...]}``, or an
+    error response."""
+    ratelimits = request.json.get("ratelimits")
+
+    if not ratelimits or not isinstance(ratelimits, list):
+        return None, ({"error": "Ratelimits are required and must be a list"}, 400)
+
+    for ratelimit in ratelimits:
+        if not isinstance(ratelimit, dict):
+            return None, ({"error": "Each ratelimit must be an object"}, 400)
+
+        target_user_id = ratelimit.get("user_id")
+        if not target_user_id or not isinstance(target_user_id, str):
+            return None, ({"error": "Target user ID is required"}, 400)
+
+        if not with_limits:
+            continue
+
+        period = ratelimit.get("period")
+        if not period or not isinstance(period, int):
+            return None, ({"error": "Period is required"}, 400)
+
+        limit = ratelimit.get("limit")
+        if not limit or not isinstance(limit, int):
+            return None, ({"error": "Limit is required"}, 400)
+
+    if len({ratelimit["user_id"] for ratelimit in ratelimits}) != len(ratelimits):
+        return None, ({"error": "Each user ID may only appear once"}, 400)
+
+    return ratelimits, None
+
+
+async def add_ratelimits():
+    user_id = g.user_id
+
+    client = get_client()
+
+    ratelimits, error = _ratelimits_from_request()
+    if error:
+        return error
+
+    batch = ChunkedWriteBatch(client)
+    for ratelimit in ratelimits:
+        target_user_id = ratelimit["user_id"]
+        batch.reserve(1 + aggregate.writes())
+        batch.set(_ratelimit_ref(client, user_id, target_user_id), ratelimit)
+        aggregate.stage_set(
+            batch, client, user_id, "rateLimits", target_user_id, ratelimit
+        )
+    await batch.commit()
+
+    settings_snapshots.invalidate(user_id)
+
+    return {"message": "Ratelimits added", "count": len(ratelimits)}, 201
+
+
+async def update_ratelimits():
+    user_id = g.user_id
+
+    client = get_client()
+
+    ratelimits, error = _ratelimits_from_request()
+    if error:
+        return error
+
+    refs = [
+        _ratelimit_ref(client, user_id, ratelimit["user_id"])
+        for ratelimit in ratelimits
+    ]
+
+    missing = await missing_documents(client, refs)
+    if missing:
+        return {"error": "Ratelimit not found", "user_ids": missing}, 404
+
+    batch = ChunkedWriteBatch(client)
+    for ref, ratelimit in zip(refs, ratelimits):
+        batch.reserve(1 + aggregate.writes())
+        batch.update(ref, ratelimit)
+        aggregate.stage_update(
+            batch, client, user_id, "rateLimits", ratelimit["user_id"], ratelimit
+        )
+    await batch.commit()
+
+    settings_snapshots.invalidate(user_id)
+
+    return {"message": "Ratelimits updated", "count": len(ratelimits)}, 200
+
+
+async def delete_ratelimits():
+    user_id = g.user_id
+
+    client = get_client()
+
+    ratelimits, error = _ratelimits_from_request(with_limits=False)
+    if error:
+        return error
+
+    batch = ChunkedWriteBatch(client)
+    for ratelimit in ratelimits:
+        target_user_id = ratelimit["user_id"]
+        batch.reserve(1 + aggregate.writes())
+        batch.delete(_ratelimit_ref(client, user_id, target_user_id))
+        aggregate.stage_delete(batch, client, user_id, "rateLimits", target_user_id)
+    await batch.commit()
+
+    settings_snapshots.invalidate(user_id)
+
+    return {"message": "Ratelimits deleted", "count": len(ratelimits)}, 200
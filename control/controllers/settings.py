@@ -3,17 +3,23 @@ from google.cloud import firestore
 import time
 import asyncio
 
+from .. import aggregate
+from ..db import get_client
+from ..snapshots import settings_snapshots
 
-async def get_settings():
-    start_time = time.time()
-    user_id = g.user_id
 
-    client = firestore.AsyncClient()
+async def read_settings(user_id: str):
+    client = get_client()
+
+    if aggregate.enabled():
+        res = await aggregate.read(client, user_id)
+        if res is not aggregate.INCOMPLETE:
+            return res
 
     settings = await client.collection("settings").document(user_id).get()
 
     if not settings.exists:
-        return {"error": "Settings not found"}, 404
+        return None
 
     res = settings.to_dict()
 
@@ -38,24 +44,66 @@ async def get_settings():
     res["bans"] = [ban.to_dict() for ban in bans]
     res["rateLimits"] = [rate_limit.to_dict() for rate_limit in rate_limits]
 
-    end_time = time.time()
-    elapsed_time = end_time - start_time
-    print(f"get_settings execution time: {elapsed_time:.4f} seconds")
-
     return res
 
 
+async def get_settings():
+    user_id = g.user_id
+
+    snapshot = settings_snapshots.get(user_id)
+
+    if snapshot is None:
+        start_time = time.time()
+        version = settings_snapshots.version(user_id)
+
+        res = await read_settings(user_id)
+
+        if res is None:
+            return {"error": "Settings not found"}, 404
+
+        snapshot = settings_snapshots.put(user_id, res, version)
+
+        end_time = time.time()
+        elapsed_time = end_time - start_time
+        print(f"get_settings execution time: {elapsed_time:.4f} seconds")
+
+    headers = {"ETag": f'"{snapshot.etag}"', "Cache-Control": "private, no-cache"}
+
+    if request.if_none_match.contains(snapshot.etag):
+        return "", 304, headers
+
+    return snapshot.document, 200, headers
+
+
 async def update_settings():
     user_id = g.user_id
 
     settings = request.json
 
-    client = firestore.AsyncClient()
-    await client.collection("settings").document(user_id).set(settings, merge=True)
+    client = get_client()
+    if aggregate.enabled():
+        await _set_settings(client.transaction(), client, user_id, settings)
+    else:
+        await client.collection("settings").document(user_id).set(settings, merge=True)
+
+    settings_snapshots.invalidate(user_id)
 
     return {"message": "Settings updated"}, 200
 
 
+@firestore.async_transactional
+async def _set_settings(transaction, client, user_id, settings):
+    settings_ref = client.collection("settings").document(user_id)
+
+    snapshot = await settings_ref.get(transaction=transaction)
+    if not snapshot.exists:
+        # users created after the migration get their aggregate with their
+        # settings, so reads do not fall back to the subcollections
+        await aggregate.stage_rebuild(transaction, client, user_id)
+
+    transaction.set(settings_ref, settings, merge=True)
+
+
 async def delete_settings_field():
     user_id = g.user_id
 
@@ -64,11 +112,13 @@ async def delete_settings_field():
     if not field:
         return {"error": "Field is required"}, 400
 
-    client = firestore.AsyncClient()
+    client = get_client()
     await client.collection("settings").document(user_id).update(
         {field: firestore.DELETE_FIELD}
     )
 
+    settings_snapshots.invalidate(user_id)
+
     return {"message": "Field deleted"}, 200
 
 
@@ -80,16 +130,27 @@ async def add_voice_to_settings():
     if not voice_id:
         return {"error": "Voice ID is required"}, 400
 
-    client = firestore.AsyncClient()
+    client = get_client()
 
     voice = await client.collection("voices").document(voice_id).get()
 
     if not voice.exists:
         return {"error": "Voice not found"}, 404
 
-    await client.collection("settings").document(user_id).collection("voices").document(
-        voice_id
-    ).set(voice.to_dict())
+    ref = (
+        client.collection("settings")
+        .document(user_id)
+        .collection("voices")
+        .document(voice_id)
+    )
+    data = voice.to_dict()
+
+    batch = client.batch()
+    batch.set(ref, data)
+    aggregate.stage_set(batch, client, user_id, "voices", voice_id, data)
+    await batch.commit()
+
+    settings_snapshots.invalidate(user_id)
 
     return {"message": "Voice added to settings"}, 200
 
@@ -102,11 +163,21 @@ async def delete_voice_from_settings():
     if not voice_id:
         return {"error": "Voice ID is required"}, 400
 
-    client = firestore.AsyncClient()
+    client = get_client()
 
-    await client.collection("settings").document(user_id).collection("voices").document(
-        voice_id
-    ).delete()
+    ref = (
+        client.collection("settings")
+        .document(user_id)
+        .collection("voices")
+        .document(voice_id)
+    )
+
+    batch = client.batch()
+    batch.delete(ref)
+    aggregate.stage_delete(batch, client, user_id, "voices", voice_id)
+    await batch.commit()
+
+    settings_snapshots.invalidate(user_id)
 
     return {"message": "Voice deleted from settings"}, 200
 
@@ -120,16 +191,27 @@ async def add_bit_to_settings():
     if not bit_id:
         return {"error": "Bit ID is required"}, 400
 
-    client = firestore.AsyncClient()
+    client = get_client()
 
     bit = await client.collection("bits").document(bit_id).get()
 
     if not bit.exists:
         return {"error": "Bit not found"}, 404
 
-    await client.collection("settings").document(user_id).collection("bits").document(
-        bit_id
-    ).set({"url": bit.get("url"), "volume": volume})
+    ref = (
+        client.collection("settings")
+        .document(user_id)
+        .collection("bits")
+        .document(bit_id)
+    )
+    data = {"url": bit.get("url"), "volume": volume}
+
+    batch = client.batch()
+    batch.set(ref, data)
+    aggregate.stage_set(batch, client, user_id, "bits", bit_id, data)
+    await batch.commit()
+
+    settings_snapshots.invalidate(user_id)
 
     return {"message": "Bit added to settings"}, 200
 
@@ -142,10 +224,20 @@ async def delete_bit_from_settings():
     if not bit_id:
         return {"error": "Bit ID is required"}, 400
 
-    client = firestore.AsyncClient()
+    client = get_client()
+
+    ref = (
+        client.collection("settings")
+        .document(user_id)
+        .collection("bits")
+        .document(bit_id)
+    )
+
+    batch = client.batch()
+    batch.delete(ref)
+    aggregate.stage_delete(batch, client, user_id, "bits", bit_id)
+    await batch.commit()
 
-    await client.collection("settings").document(user_id).collection("bits").document(
-        bit_id
-    ).delete()
+    settings_snapshots.invalidate(user_id)
 
     return {"message": "Bit deleted from settings"}, 200
@@ -1,9 +1,10 @@
 from flask import request
-from google.cloud import firestore
+
+from ..db import get_client
 
 
 async def get_voices():
-    client = firestore.AsyncClient()
+    client = get_client()
 
     page_size = int(request.args.get("page_size", 10))
     cursor = request.args.get("cursor", None)
@@ -27,7 +28,7 @@ async def get_voices():
 
 
 async def get_voice(voice_id: str):
-    client = firestore.AsyncClient()
+    client = get_client()
 
     voice = await client.collection("voices").document(voice_id).get()
 
@@ -38,7 +39,7 @@ async def get_voice(voice_id: str):
 
 
 async def add_voice():
-    client = firestore.AsyncClient()
+    client = get_client()
 
     key = request.json.get("key")
 
@@ -71,7 +72,7 @@ async def add_voice():
 
 
 async def update_voice(voice_id: str):
-    client = firestore.AsyncClient()
+    client = get_client()
 
     voice = request.json
 
@@ -86,7 +87,7 @@ async def update_voice(voice_id: str):
 
 
 async def delete_voice(key: str):
-    client = firestore.AsyncClient()
+    client = get_client()
 
     await client.collection("voices").document(key).delete()
 
@@ -0,0 +1,96 @@
+import asyncio
+import os
+import threading
+from typing import List, Optional
+
+from google.cloud import firestore
+
+# One Firestore client per process and event loop, so requests share its
+# gRPC channel, credentials and TLS session instead of opening their own.
+
+_lock = threading.Lock()
+_client: Optional[firestore.AsyncClient] = None
+_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_client() -> firestore.AsyncClient:
+    """The shared AsyncClient, created on first use.
+
+    It is recreated when called from a different event loop than the one it
+    was created on, since its channel cannot be used from another loop.
+    """
+    global _client, _loop
+
+    loop = asyncio.get_running_loop()
+
+    with _lock:
+        if _client is None or _loop is not loop:
+            _client = firestore.AsyncClient()
+            _loop = loop
+        return _client
+
+
+def reset_client():
+    global _client, _loop
+
+    with _lock:
+        _client = None
+        _loop = None
+
+
+def _reset_after_fork():
+    # gRPC channels must not be used across a fork
+    global _lock, _client, _loop
+
+    _lock = threading.Lock()
+    _client = None
+    _loop = None
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+async def missing_documents(client: firestore.AsyncClient, refs) -> List[str]:
+    """IDs of the referenced documents that do not exist, in one read."""
+    docs = [doc async for doc in client.get_all(refs)]
+    return sorted(doc.id for doc in docs if not doc.exists)
+
+
+class ChunkedWriteBatch:
+    """Collects writes like a WriteBatch and commits them in batches of at
+    most ``max_writes``, Firestore's limit per commit.
+
+    Writes that belong together are kept in one batch by calling
+    ``reserve`` with their count first. Only each batch is atomic; if a
+    later one fails, earlier ones stay committed.
+    """
+
+    def __init__(self, client: firestore.AsyncClient, max_writes: int = 500):
+        self.client = client
+        self.max_writes = max_writes
+        self.batches = [client.batch()]
+        self.sizes = [0]
+
+    def reserve(self, writes: int):
+        if self.sizes[-1] and self.sizes[-1] + writes > self.max_writes:
+            self.batches.append(self.client.batch())
+            self.sizes.append(0)
+
+    def _batch(self):
+        self.reserve(1)
+        self.sizes[-1] += 1
+        return self.batches[-1]
+
+    def set(self, reference, document_data, merge=False):
+        self._batch().set(reference, document_data, merge=merge)
+
+    def update(self, reference, field_updates):
+        self._batch().update(reference, field_updates)
+
+    def delete(self, reference):
+        self._batch().delete(reference)
+
+    async def commit(self):
+        for batch, size in zip(self.batches, self.sizes):
+            if size:
+                await batch.commit()
@@ -0,0 +1,51 @@
+import asyncio
+import os
+import threading
+from typing import Awaitable, Callable, Optional
+
+# Flask runs every async view in a fresh event loop, and gRPC channels are
+# tied to the loop that opened them. Running views on one long-lived loop
+# instead is what lets clients such as Firestore's be reused across
+# requests.
+
+_lock = threading.Lock()
+_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_loop() -> asyncio.AbstractEventLoop:
+    global _loop
+
+    with _lock:
+        if _loop is None or _loop.is_closed():
+            _loop = asyncio.new_event_loop()
+            threading.Thread(
+                target=_loop.run_forever, name="control-loop", daemon=True
+            ).start()
+        return _loop
+
+
+def _reset_after_fork():
+    # the loop's thread does not survive a fork, so the child starts its own
+    global _lock, _loop
+
+    _lock = threading.Lock()
+    _loop = None
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def run(coro: Awaitable):
+    """Run ``coro`` on the shared loop and wait for its result.
+
+    The calling thread's context variables, Flask's request context among
+    them, are copied into the task.
+    """
+    return asyncio.run_coroutine_threadsafe(coro, get_loop()).result()
+
+
+def async_to_sync(func: Callable[..., Awaitable]) -> Callable:
+    def wrapper(*args, **kwargs):
+        return run(func(*args, **kwargs))
+
+    return wrapper
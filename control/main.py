@@ -1,27 +1,30 @@
-import logging
 import os
 from functools import wraps
 
 import functions_framework
-import httpx
 import jwt
 from dotenv import load_dotenv
 from flask import Flask, Request, Response, g, request
 from werkzeug.middleware.proxy_fix import ProxyFix
 
+from . import auth, loop
 from .controllers import (
     add_admins,
     add_ban,
+    add_bans,
     add_bit,
     add_bit_to_settings,
     add_ratelimit,
+    add_ratelimits,
     add_voice,
     add_voice_to_settings,
     delete_admins,
     delete_ban,
+    delete_bans,
     delete_bit,
     delete_bit_from_settings,
     delete_ratelimit,
+    delete_ratelimits,
     delete_settings_field,
     delete_voice,
     delete_voice_from_settings,
@@ -37,16 +40,16 @@ from .controllers import (
     status_check,
     update_admins,
     update_ban,
+    update_bans,
     update_bit,
     update_ratelimit,
+    update_ratelimits,
     update_settings,
     update_voice,
 )
 
 load_dotenv()
 
-AUTH_SERVICE_URL = os.getenv("AUTH_SERVICE_URL")
-
 JWT_PUBLIC_KEY = os.getenv("JWT_PUBLIC_KEY")
 
 WS_SERVICE_URL = os.getenv("WS_SERVICE_URL")
@@ -55,6 +58,8 @@ JWT_PRIVATE_KEY = os.getenv("JWT_PRIVATE_KEY")
 
 
 app = Flask(__name__)
+# async views share one event loop, and with it the Firestore client
+app.async_to_sync = loop.async_to_sync
 # app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1, x_proto=1, x_host=1, x_prefix=1)
 
 
@@ -99,31 +104,21 @@ def require_auth(f):
                 401,
             )
 
-        async with httpx.AsyncClient() as client:
-            res = await client.post(
-                f"{AUTH_SERVICE_URL}/validate",
-                headers={"Authorization": f"Bearer {code}"},
+        status_code, body = await auth.validate(code)
+
+        if status_code == 400:
+            return (
+                {"error": "Missing or invalid authorization header"},
+                401,
+            )
+        if status_code == 401:
+            return (
+                {"error": "Unauthorized"},
+                401,
             )
 
-            if res.status_code != 200:
-                logging.error(
-                    f"Request to {AUTH_SERVICE_URL}/validate failed with status code {res.status_code} and response {res.text}"
-                )
-
-            if res.status_code == 400:
-                return (
-                    {"error": "Missing or invalid authorization header"},
-                    401,
-                )
-            if res.status_code == 401:
-                return (
-                    {"error": "Unauthorized"},
-                    401,
-                )
-
-            user_id = res.json().get("user_id")
-            g.user_id = user_id
-            g.name = res.json().get("name")
+        g.user_id = body.get("user_id")
+        g.name = body.get("name")
 
         return await f(*args, **kwargs)
 
@@ -332,6 +327,24 @@ async def update_ban_handler():
     return await update_ban()
 
 
+@app.post("/settings/bans/bulk")
+@require_auth
+async def add_bans_handler():
+    return await add_bans()
+
+
+@app.put("/settings/bans/bulk")
+@require_auth
+async def update_bans_handler():
+    return await update_bans()
+
+
+@app.delete("/settings/bans/bulk")
+@require_auth
+async def delete_bans_handler():
+    return await delete_bans()
+
+
 @app.get("/settings/ratelimits")
 @require_auth
 async def get_ratelimits_handler():
@@ -356,6 +369,24 @@ async def update_ratelimit_handler():
     return await update_ratelimit()
 
 
+@app.post("/settings/ratelimits/bulk")
+@require_auth
+async def add_ratelimits_handler():
+    return await add_ratelimits()
+
+
+@app.put("/settings/ratelimits/bulk")
+@require_auth
+async def update_ratelimits_handler():
+    return await update_ratelimits()
+
+
+@app.delete("/settings/ratelimits/bulk")
+@require_auth
+async def delete_ratelimits_handler():
+    return await delete_ratelimits()
+
+
 @functions_framework.http
 def main(request: Request):
     with app.request_context(request.environ):
@@ -0,0 +1,106 @@
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import httpx
+from flask import Flask
+from google.cloud import firestore
+
+# Per-request latency of GET /settings with a Firestore client built for
+# every request, as the controllers used to, against the shared client.
+#
+#   gcloud emulators firestore start --host-port=localhost:8080
+#   FIRESTORE_EMULATOR_HOST=localhost:8080 python control/script/bench_firestore_client.py
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from control import app  # noqa: E402
+from control import loop  # noqa: E402
+from control.controllers import settings as settings_controller  # noqa: E402
+from control.snapshots import settings_snapshots  # noqa: E402
+
+USER_ID = "bench_user"
+
+
+class AuthResponse:
+    status_code = 200
+    text = ""
+
+    def json(self):
+        return {"user_id": USER_ID, "name": "bench"}
+
+
+async def validate(*args, **kwargs):
+    return AuthResponse()
+
+
+def seed():
+    client = firestore.Client()
+    settings = client.collection("settings").document(USER_ID)
+    settings.set({"roomId": "bench", "ttsVolume": 1.0})
+    for i in range(5):
+        settings.collection("voices").document(f"voice_{i}").set({"name": f"v{i}"})
+        settings.collection("bits").document(f"bit_{i}").set({"url": f"u{i}"})
+
+
+def measure(requests: int):
+    client = app.test_client()
+    headers = {"Authorization": "Bearer bench"}
+
+    client.get("/settings", headers=headers)
+
+    timings = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        res = client.get("/settings", headers=headers)
+        timings.append((time.perf_counter() - start) * 1000)
+        assert res.status_code == 200, res.data
+
+    timings.sort()
+    return {
+        "mean": statistics.mean(timings),
+        "p50": timings[len(timings) // 2],
+        "p95": timings[int(len(timings) * 0.95)],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="GET /settings latency, per-request vs shared Firestore client"
+    )
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    if not os.getenv("FIRESTORE_EMULATOR_HOST"):
+        sys.exit("Set FIRESTORE_EMULATOR_HOST to run against the emulator")
+
+    httpx.AsyncClient.post = validate
+    # every timed request has to reach Firestore, not the snapshot cache
+    settings_snapshots.ttl = 0
+    seed()
+
+    shared_get_client = settings_controller.get_client
+
+    # what every request did before: a new loop and a new client
+    app.async_to_sync = Flask.async_to_sync.__get__(app)
+    settings_controller.get_client = firestore.AsyncClient
+    per_request = measure(args.requests)
+
+    app.async_to_sync = loop.async_to_sync
+    settings_controller.get_client = shared_get_client
+    shared = measure(args.requests)
+
+    for name, result in (
+        ("per-request client", per_request),
+        ("shared client", shared),
+    ):
+        print(
+            f"{name:20} mean {result['mean']:7.2f} ms  "
+            f"p50 {result['p50']:7.2f} ms  p95 {result['p95']:7.2f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+import asyncio
+import os
+import sys
+
+from google.cloud import firestore
+
+# Builds the aggregate documents read by the compact settings layout
+# (SETTINGS_LAYOUT=compact) from each user's subcollections. Safe to run
+# while the control service is serving writes, and again after changing
+# SETTINGS_BAN_SHARDS. Users created while the layout is enabled get their
+# aggregate with their settings document.
+#
+#   python control/script/migrate_settings_aggregate.py [user_id ...]
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from control import aggregate  # noqa: E402
+
+
+@firestore.async_transactional
+async def migrate_user(transaction, client, user_id):
+    return await aggregate.stage_rebuild(transaction, client, user_id)
+
+
+async def main():
+    client = firestore.AsyncClient()
+
+    user_ids = sys.argv[1:]
+    if not user_ids:
+        user_ids = [doc.id async for doc in client.collection("settings").stream()]
+
+    for user_id in user_ids:
+        counts = await migrate_user(client.transaction(), client, user_id)
+        print(f"Migrated settings: {user_id} {counts}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
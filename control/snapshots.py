@@ -0,0 +1,93 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, NamedTuple, Optional
+
+# seconds an assembled settings document is served from memory; writes made
+# through this instance invalidate it straight away, the TTL bounds how long
+# writes made elsewhere can go unseen
+SETTINGS_CACHE_TTL = float(os.getenv("SETTINGS_CACHE_TTL", 30))
+SETTINGS_CACHE_MAX_ENTRIES = int(os.getenv("SETTINGS_CACHE_MAX_ENTRIES", 1000))
+
+
+class Snapshot(NamedTuple):
+    etag: str
+    document: dict
+
+
+def compute_etag(document: dict) -> str:
+    body = json.dumps(document, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(body.encode()).hexdigest()[:32]
+
+
+class SettingsSnapshots:
+    """Assembled ``get_settings`` documents per user.
+
+    Every write bumps the user's version, and a snapshot read before a
+    write is not stored after it, so a slow read cannot bring back data a
+    write has already replaced.
+    """
+
+    def __init__(self, ttl: float = 30, max_entries: int = 1000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self.versions: Dict[str, int] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id: str) -> Optional[Snapshot]:
+        with self.lock:
+            entry = self.entries.get(user_id)
+            if entry is not None:
+                snapshot, expires = entry
+                if expires > time.monotonic():
+                    self.hits += 1
+                    self.entries.move_to_end(user_id)
+                    return snapshot
+                del self.entries[user_id]
+
+            self.misses += 1
+            return None
+
+    def version(self, user_id: str) -> int:
+        with self.lock:
+            return self.versions.get(user_id, 0)
+
+    def put(self, user_id: str, document: dict, version: int) -> Snapshot:
+        snapshot = Snapshot(compute_etag(document), document)
+
+        if self.ttl <= 0:
+            return snapshot
+
+        with self.lock:
+            if self.versions.get(user_id, 0) != version:
+                return snapshot
+
+            self.entries[user_id] = (snapshot, time.monotonic() + self.ttl)
+            self.entries.move_to_end(user_id)
+            if len(self.entries) > self.max_entries:
+                # versions are kept, forgetting one could let a read that
+                # started before a write store its result after it
+                self.entries.popitem(last=False)
+
+        return snapshot
+
+    def invalidate(self, user_id: str):
+        with self.lock:
+            self.entries.pop(user_id, None)
+            self.versions[user_id] = self.versions.get(user_id, 0) + 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.versions.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+settings_snapshots = SettingsSnapshots(SETTINGS_CACHE_TTL, SETTINGS_CACHE_MAX_ENTRIES)
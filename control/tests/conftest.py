@@ -0,0 +1,14 @@
+import pytest
+
+from control import auth
+from control.snapshots import settings_snapshots
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    """Tests mock different responses for the same token and user."""
+    auth.clear()
+    settings_snapshots.clear()
+    yield
+    auth.clear()
+    settings_snapshots.clear()
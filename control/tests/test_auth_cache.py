@@ -0,0 +1,116 @@
+import asyncio
+
+import pytest
+from _pytest.monkeypatch import MonkeyPatch
+from flask.testing import FlaskClient
+
+from control import app, auth, loop
+
+
+class MockResponse:
+    def __init__(self, json_data, status_code):
+        self.json_data = json_data
+        self.status_code = status_code
+        self.text = ""
+
+    def json(self):
+        return self.json_data
+
+
+def counting_post(json_data, status_code, calls, delay=0):
+    async def mock_post(*args, **kwargs):
+        calls.append(kwargs["headers"]["Authorization"])
+        await asyncio.sleep(delay)
+        return MockResponse(json_data, status_code)
+
+    return mock_post
+
+
+@pytest.fixture()
+def client():
+    app.config["TESTING"] = True
+    with app.test_client() as client:
+        yield client
+
+
+def test_validation_is_cached(monkeypatch: MonkeyPatch):
+    calls = []
+    monkeypatch.setattr(
+        "httpx.AsyncClient.post",
+        counting_post({"user_id": "user_id", "name": "name"}, 200, calls),
+    )
+
+    first = loop.run(auth.validate("code"))
+    second = loop.run(auth.validate("code"))
+
+    assert first == second == (200, {"user_id": "user_id", "name": "name"})
+    assert len(calls) == 1
+
+
+def test_rejections_are_cached_briefly(monkeypatch: MonkeyPatch):
+    calls = []
+    monkeypatch.setattr("httpx.AsyncClient.post", counting_post({}, 401, calls))
+
+    assert loop.run(auth.validate("code"))[0] == 401
+    assert loop.run(auth.validate("code"))[0] == 401
+    assert len(calls) == 1
+
+    monkeypatch.setattr(auth, "AUTH_NEGATIVE_CACHE_TTL", 0)
+    auth.clear()
+    loop.run(auth.validate("code"))
+    loop.run(auth.validate("code"))
+    assert len(calls) == 3
+
+
+def test_server_errors_are_not_cached(monkeypatch: MonkeyPatch):
+    calls = []
+    monkeypatch.setattr("httpx.AsyncClient.post", counting_post({}, 500, calls))
+
+    loop.run(auth.validate("code"))
+    loop.run(auth.validate("code"))
+
+    assert len(calls) == 2
+
+
+def test_concurrent_validations_share_one_call(monkeypatch: MonkeyPatch):
+    calls = []
+    monkeypatch.setattr(
+        "httpx.AsyncClient.post",
+        counting_post({"user_id": "user_id"}, 200, calls, delay=0.05),
+    )
+
+    async def validate_many():
+        return await asyncio.gather(
+            *(auth.validate("code") for _ in range(10)), auth.validate("other")
+        )
+
+    results = loop.run(validate_many())
+
+    assert all(result == (200, {"user_id": "user_id"}) for result in results)
+    assert sorted(calls) == ["Bearer code", "Bearer other"]
+
+
+def test_least_recently_used_code_is_evicted(monkeypatch: MonkeyPatch):
+    calls = []
+    monkeypatch.setattr(
+        "httpx.AsyncClient.post", counting_post({"user_id": "user_id"}, 200, calls)
+    )
+    monkeypatch.setattr(auth.cache, "max_entries", 2)
+
+    for code in ("a", "b", "a", "c", "a", "b"):
+        loop.run(auth.validate(code))
+
+    assert calls == ["Bearer a", "Bearer b", "Bearer c", "Bearer b"]
+
+
+def test_rejected_code_returns_unauthorized(
+    client: FlaskClient, monkeypatch: MonkeyPatch
+):
+    calls = []
+    monkeypatch.setattr("httpx.AsyncClient.post", counting_post({}, 401, calls))
+
+    for _ in range(3):
+        response = client.get("/settings", headers={"Authorization": "Bearer code"})
+        assert response.status_code == 401
+
+    assert len(calls) == 1
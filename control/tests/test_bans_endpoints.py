@@ -117,3 +117,53 @@ def test_delete_ban(client: FlaskClient):
     response = client.delete("/settings/bans", json={"user_id": "banned_user_id"})
 
     assert response.status_code == 200
+
+
+def test_bulk_bans(client: FlaskClient):
+    """Test adding, updating and deleting many bans in one request."""
+
+    bans = [{"user_id": f"bulk_user_{i}", "expiration": i} for i in range(600)]
+
+    response = client.post("/settings/bans/bulk", json={"bans": bans})
+
+    assert response.status_code == 201
+    assert response.get_json()["count"] == 600
+
+    response = client.get("/settings/bans")
+    banned = {ban["user_id"]: ban["expiration"] for ban in response.get_json()}
+    assert all(banned[ban["user_id"]] == ban["expiration"] for ban in bans)
+
+    response = client.put(
+        "/settings/bans/bulk",
+        json={"bans": [{"user_id": "bulk_user_1", "expiration": 1000}]},
+    )
+
+    assert response.status_code == 200
+    assert client.get("/settings/bans/bulk_user_1").get_json()["expiration"] == 1000
+
+    response = client.delete("/settings/bans/bulk", json={"bans": bans})
+
+    assert response.status_code == 200
+
+    response = client.get("/settings/bans")
+    assert not any(ban["user_id"].startswith("bulk_user_") for ban in response.json)
+
+
+def test_bulk_update_missing_ban(client: FlaskClient):
+    """Test that a bulk update with an unknown ban writes nothing."""
+
+    client.post("/settings/bans/bulk", json={"bans": [{"user_id": "bulk_existing"}]})
+
+    response = client.put(
+        "/settings/bans/bulk",
+        json={
+            "bans": [
+                {"user_id": "bulk_existing", "expiration": 5},
+                {"user_id": "bulk_missing", "expiration": 5},
+            ]
+        },
+    )
+
+    assert response.status_code == 404
+    assert response.get_json()["user_ids"] == ["bulk_missing"]
+    assert client.get("/settings/bans/bulk_existing").get_json()["expiration"] == -1
@@ -0,0 +1,102 @@
+import pytest
+from _pytest.monkeypatch import MonkeyPatch
+from flask.testing import FlaskClient
+from google.auth.credentials import AnonymousCredentials
+from google.cloud import firestore
+
+from control import app
+from control.controllers import bans as bans_controller
+from control.controllers import ratelimits as ratelimits_controller
+from control.db import ChunkedWriteBatch
+
+
+def create_mock_response(json_data, status_code):
+
+    async def mock_post(*args, **kwargs):
+        class MockResponse:
+            def __init__(self, json_data, status_code):
+                self.json_data = json_data
+                self.status_code = status_code
+
+            def json(self):
+                return self.json_data
+
+        return MockResponse(json_data, status_code)
+
+    return mock_post
+
+
+@pytest.fixture()
+def firestore_client():
+    # only builds writes, nothing is sent
+    return firestore.AsyncClient(project="test", credentials=AnonymousCredentials())
+
+
+@pytest.fixture()
+def client(monkeypatch: MonkeyPatch, firestore_client):
+    monkeypatch.setattr(
+        "httpx.AsyncClient.post", create_mock_response({"user_id": "user_id"}, 200)
+    )
+    monkeypatch.setattr(bans_controller, "get_client", lambda: firestore_client)
+    monkeypatch.setattr(ratelimits_controller, "get_client", lambda: firestore_client)
+
+    app.config["TESTING"] = True
+    with app.test_client() as client:
+        client.environ_base["HTTP_AUTHORIZATION"] = "Bearer fake_token"
+        yield client
+
+
+def test_writes_are_split_at_the_batch_limit(firestore_client):
+    batch = ChunkedWriteBatch(firestore_client, max_writes=500)
+    collection = firestore_client.collection("bans")
+
+    for i in range(1200):
+        batch.set(collection.document(str(i)), {"expiration": -1})
+
+    assert batch.sizes == [500, 500, 200]
+
+
+def test_reserved_writes_stay_together(firestore_client):
+    batch = ChunkedWriteBatch(firestore_client, max_writes=5)
+    collection = firestore_client.collection("bans")
+
+    for i in range(4):
+        batch.reserve(2)
+        batch.set(collection.document(str(i)), {"expiration": -1})
+        batch.delete(collection.document(f"{i}-mirror"))
+
+    assert batch.sizes == [4, 4]
+
+
+@pytest.mark.parametrize(
+    "bans",
+    [
+        None,
+        {"user_id": "a"},
+        [{"user_id": ""}],
+        [{"user_id": "a", "expiration": "soon"}],
+        [{"user_id": "a", "expiration": -2}],
+        [{"user_id": "a"}, {"user_id": "a"}],
+    ],
+)
+def test_invalid_bulk_bans_are_rejected(client: FlaskClient, bans):
+    response = client.post("/settings/bans/bulk", json={"bans": bans})
+
+    assert response.status_code == 400
+    assert "error" in response.get_json()
+
+
+@pytest.mark.parametrize(
+    "ratelimits",
+    [
+        [],
+        [{"user_id": "a", "period": 60}],
+        [{"user_id": "a", "limit": 10}],
+        [{"period": 60, "limit": 10}],
+    ],
+)
+def test_invalid_bulk_ratelimits_are_rejected(client: FlaskClient, ratelimits):
+    response = client.post("/settings/ratelimits/bulk", json={"ratelimits": ratelimits})
+
+    assert response.status_code == 400
+    assert "error" in response.get_json()
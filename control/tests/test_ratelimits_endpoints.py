@@ -121,3 +121,34 @@ def test_delete_ratelimit(client: FlaskClient):
     response = client.get("/settings/ratelimits")
     assert response.status_code == 200
     assert response.json == []
+
+
+def test_bulk_ratelimits(client: FlaskClient):
+    """Test adding, updating and deleting many ratelimits in one request."""
+    ratelimits = [
+        {"user_id": f"bulk_user_{i}", "period": 60, "limit": i + 1} for i in range(3)
+    ]
+
+    response = client.post("/settings/ratelimits/bulk", json={"ratelimits": ratelimits})
+    assert response.status_code == 201
+
+    response = client.get("/settings/ratelimits")
+    assert len(response.json) == 3
+
+    response = client.put(
+        "/settings/ratelimits/bulk",
+        json={"ratelimits": [{"user_id": "bulk_user_0", "period": 30, "limit": 5}]},
+    )
+    assert response.status_code == 200
+
+    response = client.get("/settings/ratelimits")
+    updated = next(r for r in response.json if r["user_id"] == "bulk_user_0")
+    assert updated["period"] == 30
+
+    response = client.delete(
+        "/settings/ratelimits/bulk", json={"ratelimits": ratelimits}
+    )
+    assert response.status_code == 200
+
+    response = client.get("/settings/ratelimits")
+    assert response.json == []
@@ -0,0 +1,101 @@
+import asyncio
+
+import pytest
+from _pytest.monkeypatch import MonkeyPatch
+from google.auth.credentials import AnonymousCredentials
+from google.cloud import firestore
+from google.cloud.firestore_v1.base_document import DocumentSnapshot
+
+from control import aggregate
+
+
+@pytest.fixture()
+def firestore_client():
+    # only builds writes, nothing is sent
+    return firestore.AsyncClient(project="test", credentials=AnonymousCredentials())
+
+
+@pytest.fixture()
+def compact(monkeypatch: MonkeyPatch):
+    monkeypatch.setattr(aggregate, "SETTINGS_LAYOUT", "compact")
+    monkeypatch.setattr(aggregate, "SETTINGS_BAN_SHARDS", 4)
+
+
+def test_build_shards_bans(compact):
+    bans = {f"user_{i}": {"expiration": i} for i in range(20)}
+
+    docs = aggregate.build({"voices": {"voice": {"name": "v"}}, "bans": bans})
+
+    assert docs["items"]["voices"] == {"voice": {"name": "v"}}
+    assert docs["items"]["banShards"] == 4
+    assert sorted(docs) == ["bans-0", "bans-1", "bans-2", "bans-3", "items"]
+
+    merged = {}
+    for shard in range(4):
+        for target_user_id, ban in docs[f"bans-{shard}"]["bans"].items():
+            assert aggregate.ban_shard(target_user_id) == shard
+            merged[target_user_id] = ban
+    assert merged == bans
+
+
+def test_writes_mirror_into_aggregate(compact, firestore_client):
+    batch = firestore_client.batch()
+
+    aggregate.stage_set(batch, firestore_client, "u", "voices", "v", {"name": "v"})
+    aggregate.stage_update(batch, firestore_client, "u", "bans", "b", {"expiration": 5})
+    aggregate.stage_delete(batch, firestore_client, "u", "rateLimits", "r")
+
+    writes = batch._write_pbs
+    assert [write.update.name.rsplit("/", 1)[1] for write in writes] == [
+        "items",
+        f"bans-{aggregate.ban_shard('b')}",
+        "items",
+    ]
+    assert list(writes[0].update_mask.field_paths) == ["voices.v"]
+    assert list(writes[1].update_mask.field_paths) == ["bans.b.expiration"]
+    assert list(writes[2].update_mask.field_paths) == ["rateLimits.r"]
+
+
+def test_subcollection_layout_writes_nothing_extra(firestore_client):
+    batch = firestore_client.batch()
+
+    aggregate.stage_set(batch, firestore_client, "u", "voices", "v", {"name": "v"})
+    aggregate.stage_delete(batch, firestore_client, "u", "bans", "b")
+
+    assert batch._write_pbs == []
+
+
+class StoredClient:
+    """Answers get_all from ``documents``, by path; refs are built as usual."""
+
+    def __init__(self, client, documents):
+        self.client = client
+        self.documents = documents
+
+    def collection(self, *args):
+        return self.client.collection(*args)
+
+    async def get_all(self, refs):
+        for ref in refs:
+            data = self.documents.get(ref.path)
+            yield DocumentSnapshot(ref, data, data is not None, None, None, None)
+
+
+def test_read_without_marker_falls_back(compact, firestore_client):
+    # a write mirrored before the migration creates items without banShards
+    client = StoredClient(
+        firestore_client,
+        {
+            "settings/u": {"roomId": "1234"},
+            "settings/u/aggregate/items": {"voices": {"v": {"name": "v"}}},
+        },
+    )
+
+    assert asyncio.run(aggregate.read(client, "u")) is aggregate.INCOMPLETE
+
+    client.documents["settings/u/aggregate/items"]["banShards"] = 4
+
+    res = asyncio.run(aggregate.read(client, "u"))
+    assert res["roomId"] == "1234"
+    assert res["voices"] == [{"name": "v"}]
+    assert res["bans"] == []
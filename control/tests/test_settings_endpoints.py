@@ -5,7 +5,7 @@ from _pytest.monkeypatch import MonkeyPatch
 from flask.testing import FlaskClient
 from google.cloud import firestore
 
-from control import app
+from control import aggregate, app
 
 
 def create_mock_response(json_data, status_code):
@@ -367,3 +367,36 @@ class TestSettingsEndpoints:
 
     def teardown_method(self):
         pass
+
+
+def test_new_settings_build_aggregate(client: FlaskClient, monkeypatch: MonkeyPatch):
+    """Settings created with the compact layout come with a complete aggregate."""
+
+    monkeypatch.setattr(aggregate, "SETTINGS_LAYOUT", "compact")
+
+    mock_post = create_mock_response({"user_id": "compact_user_id"}, 200)
+
+    monkeypatch.setattr("httpx.AsyncClient.post", mock_post)
+
+    response = client.post(
+        "/settings",
+        json={"roomId": "1234"},
+        headers={"Authorization": "Bearer fake_token"},
+    )
+    assert response.status_code == 200
+
+    firestore_client = firestore.Client()
+    settings_ref = firestore_client.collection("settings").document("compact_user_id")
+
+    try:
+        items = settings_ref.collection("aggregate").document("items").get()
+        assert items.get("banShards") == aggregate.SETTINGS_BAN_SHARDS
+
+        response = client.get(
+            "/settings", headers={"Authorization": "Bearer fake_token"}
+        )
+        assert response.get_json()["voices"] == []
+    finally:
+        for doc in settings_ref.collection("aggregate").stream():
+            doc.reference.delete()
+        settings_ref.delete()
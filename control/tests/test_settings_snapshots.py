@@ -0,0 +1,105 @@
+import pytest
+from _pytest.monkeypatch import MonkeyPatch
+from flask.testing import FlaskClient
+
+from control import app
+from control.controllers import settings as settings_controller
+from control.snapshots import SettingsSnapshots, settings_snapshots
+
+
+def create_mock_response(json_data, status_code):
+
+    async def mock_post(*args, **kwargs):
+        class MockResponse:
+            def __init__(self, json_data, status_code):
+                self.json_data = json_data
+                self.status_code = status_code
+
+            def json(self):
+                return self.json_data
+
+        return MockResponse(json_data, status_code)
+
+    return mock_post
+
+
+@pytest.fixture()
+def client():
+    app.config["TESTING"] = True
+    with app.test_client() as client:
+        yield client
+
+
+@pytest.fixture()
+def reads(monkeypatch: MonkeyPatch):
+    """Serve settings from memory and count the Firestore reads."""
+    reads = []
+    document = {"roomId": "1234", "voices": [], "bits": [], "bans": []}
+
+    async def read_settings(user_id):
+        reads.append(user_id)
+        return dict(document)
+
+    monkeypatch.setattr(settings_controller, "read_settings", read_settings)
+    monkeypatch.setattr(
+        "httpx.AsyncClient.post",
+        create_mock_response({"user_id": "user_id", "name": "name"}, 200),
+    )
+    return reads
+
+
+def test_settings_are_served_from_snapshot(client: FlaskClient, reads):
+    headers = {"Authorization": "Bearer fake_token"}
+
+    first = client.get("/settings", headers=headers)
+    second = client.get("/settings", headers=headers)
+
+    assert first.status_code == second.status_code == 200
+    assert first.json == second.json
+    assert first.headers["ETag"] == second.headers["ETag"]
+    assert reads == ["user_id"]
+
+
+def test_unchanged_settings_return_304(client: FlaskClient, reads):
+    headers = {"Authorization": "Bearer fake_token"}
+
+    etag = client.get("/settings", headers=headers).headers["ETag"]
+    response = client.get("/settings", headers={**headers, "If-None-Match": etag})
+
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+    assert reads == ["user_id"]
+
+
+def test_invalidate_forces_a_fresh_read(client: FlaskClient, reads):
+    headers = {"Authorization": "Bearer fake_token"}
+
+    client.get("/settings", headers=headers)
+    settings_snapshots.invalidate("user_id")
+    client.get("/settings", headers=headers)
+
+    assert reads == ["user_id", "user_id"]
+
+
+def test_read_started_before_a_write_is_not_stored():
+    snapshots = SettingsSnapshots(ttl=30)
+
+    version = snapshots.version("user_id")
+    snapshots.invalidate("user_id")
+    snapshots.put("user_id", {"roomId": "old"}, version)
+
+    assert snapshots.get("user_id") is None
+
+    snapshots.put("user_id", {"roomId": "new"}, snapshots.version("user_id"))
+    assert snapshots.get("user_id").document == {"roomId": "new"}
+
+
+def test_etag_follows_content():
+    snapshots = SettingsSnapshots(ttl=30)
+
+    first = snapshots.put("a", {"roomId": "1", "voices": []}, 0)
+    same = snapshots.put("b", {"voices": [], "roomId": "1"}, 0)
+    changed = snapshots.put("c", {"roomId": "2", "voices": []}, 0)
+
+    assert first.etag == same.etag
+    assert first.etag != changed.etag
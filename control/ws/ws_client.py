@@ -1,12 +1,111 @@
+import itertools
 import json
-from typing import Any, Dict
+import threading
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
 
 import jwt
 import requests
+from websockets.exceptions import WebSocketException
+from websockets.sync.client import ClientConnection, connect
+
+
+class ProducerChannel:
+    """A persistent WebSocket to the WS server's ``/producer`` endpoint.
+
+    Authenticates once on connect, then each message is a single frame
+    write. Frames only carry an ``id`` when the caller wants to wait for
+    the server's ack, which a background thread matches back up.
+    """
+
+    def __init__(self, url: str, token_factory, timeout: float = 5.0):
+        self.url = url
+        self.token_factory = token_factory
+        self.timeout = timeout
+
+        self.lock = threading.Lock()
+        self.connection: Optional[ClientConnection] = None
+        self.pending: Dict[int, Future] = {}
+        self.ids = itertools.count(1)
+
+    def _connect(self) -> ClientConnection:
+        if self.connection is None:
+            self.connection = connect(
+                self.url,
+                additional_headers={"Authorization": f"Bearer {self.token_factory()}"},
+                open_timeout=self.timeout,
+            )
+            # acks are tracked per connection so a dying reader only fails
+            # the frames that were sent on its own connection
+            self.pending = {}
+            threading.Thread(
+                target=self._read, args=(self.connection, self.pending), daemon=True
+            ).start()
+        return self.connection
+
+    def _read(self, connection: ClientConnection, pending: Dict[int, Future]):
+        try:
+            for frame in connection:
+                ack = json.loads(frame)
+                future = pending.pop(ack.get("id"), None)
+                if future is not None:
+                    future.set_result(ack)
+        except (WebSocketException, OSError, ValueError):
+            pass
+        finally:
+            with self.lock:
+                if self.connection is connection:
+                    self.connection = None
+            for frame_id in list(pending):
+                future = pending.pop(frame_id, None)
+                if future is not None:
+                    future.set_exception(ConnectionError("producer channel closed"))
+
+    def send(self, frame: Dict[str, Any], wait: bool = False) -> Dict[str, Any]:
+        future = None
+        if wait:
+            future = Future()
+            frame = {**frame, "id": next(self.ids)}
+
+        data = json.dumps(frame)
+
+        # the server may have dropped an idle connection, so one failed
+        # write is retried on a fresh connection before giving up
+        for attempt in range(2):
+            with self.lock:
+                try:
+                    connection = self._connect()
+                    if future is not None:
+                        self.pending[frame["id"]] = future
+                    connection.send(data)
+                    break
+                except (WebSocketException, OSError):
+                    if future is not None:
+                        self.pending.pop(frame["id"], None)
+                    self.connection = None
+                    if attempt:
+                        raise
+
+        if future is None:
+            return {"status": "sent"}
+
+        return future.result(timeout=self.timeout)
+
+    def close(self):
+        with self.lock:
+            if self.connection is not None:
+                self.connection.close()
+                self.connection = None
 
 
 class WSClient:
-    def __init__(self, ws_service_url: str, jwt_private_key: str):
+    def __init__(
+        self,
+        ws_service_url: str,
+        jwt_private_key: str,
+        persistent: bool = False,
+        timeout: float = 5.0,
+    ):
 
         if not ws_service_url:
             raise ValueError("ws_service_url cannot be empty")
@@ -18,18 +117,32 @@ class WSClient:
         self.jwt_private_key = jwt_private_key
 
         self.broadcast_url = f"{self.ws_service_url.rstrip('/')}/broadcast"
+        self.broadcast_batch_url = f"{self.broadcast_url}/batch"
+
+        self.channel = None
+        if persistent:
+            producer_url = self.ws_service_url.rstrip("/").replace("http", "ws", 1)
+            self.channel = ProducerChannel(
+                f"{producer_url}/producer", self._generate_jwt_token, timeout
+            )
 
     def _generate_jwt_token(self) -> str:
-        return jwt.encode({}, self.jwt_private_key, algorithm="HS256")
+        # the WS server verifies RS256 and requires a subject
+        return jwt.encode({"sub": "control"}, self.jwt_private_key, algorithm="RS256")
 
     def send_message(
-        self, room_id: str, message_type: str, payload: Any
+        self, room_id: str, message_type: str, payload: Any, wait: bool = False
     ) -> Dict[str, Any]:
+        """Broadcast one message. Over the persistent channel this returns
+        as soon as the frame is written unless ``wait`` is set."""
 
         message = {"type": message_type, "payload": payload}
 
         data = {"room_id": room_id, "message": json.dumps(message)}
 
+        if self.channel is not None:
+            return self.channel.send(data, wait=wait)
+
         headers = {
             "Authorization": f"Bearer {self._generate_jwt_token()}",
             "Content-Type": "application/json",
@@ -40,3 +153,39 @@ class WSClient:
         response.raise_for_status()
 
         return response.json()
+
+    def send_messages(
+        self,
+        messages: Sequence[Tuple[Union[str, List[str]], str, Any]],
+        wait: bool = False,
+    ) -> Dict[str, Any]:
+        """Send ``(room_id or room_ids, message_type, payload)`` tuples in one
+        request. The response holds a result per message, in order."""
+
+        items = []
+        for room_ids, message_type, payload in messages:
+            message = json.dumps({"type": message_type, "payload": payload})
+            if isinstance(room_ids, str):
+                items.append({"room_id": room_ids, "message": message})
+            else:
+                items.append({"room_ids": list(room_ids), "message": message})
+
+        if self.channel is not None:
+            return self.channel.send({"items": items}, wait=wait)
+
+        headers = {
+            "Authorization": f"Bearer {self._generate_jwt_token()}",
+            "Content-Type": "application/json",
+        }
+
+        response = requests.post(
+            self.broadcast_batch_url, json={"items": items}, headers=headers
+        )
+
+        response.raise_for_status()
+
+        return response.json()
+
+    def close(self):
+        if self.channel is not None:
+            self.channel.close()
@@ -0,0 +1,249 @@
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+import synthesis
+from formats import MIME_TYPES
+from synthesis import (
+    audio_cache,
+    auth_cache,
+    auth_key,
+    authFeatureFlag,
+    authServiceUrl,
+    cached_audio,
+    create_registry,
+    plan_request,
+    remember_validation,
+    schedule_segments,
+    segment_key,
+    store_synthesized,
+    stream_chunk_size,
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    pool_size = int(os.getenv("TTS_HTTP_POOL_MAXSIZE", 100))
+
+    client = httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=pool_size, max_keepalive_connections=pool_size
+        ),
+        timeout=httpx.Timeout(
+            float(os.getenv("TTS_HTTP_READ_TIMEOUT", 30)),
+            connect=float(os.getenv("TTS_HTTP_CONNECT_TIMEOUT", 5)),
+        ),
+    )
+
+    app.state.client = client
+    app.state.registry = create_registry(async_client=client)
+
+    yield
+
+    await client.aclose()
+
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_methods=["GET", "POST"],
+    allow_headers=["Content-Type", "Authorization"],
+    max_age=3600,
+)
+
+
+async def check_auth(request: Request):
+    if authFeatureFlag == "true":
+        token = request.headers.get("Authorization")
+
+        if not token:
+            return Response("Missing token", 401)
+
+        code = token.split(" ")[1]
+
+        if await verify(request.app.state.client, code) is None:
+            return Response("Invalid token", 401)
+
+
+@app.get("/")
+async def tts_req(request: Request):
+    auth_error = await check_auth(request)
+    if auth_error is not None:
+        return auth_error
+
+    request_json = None
+    if request.headers.get("Content-Type", "").startswith("application/json"):
+        try:
+            request_json = await request.json()
+        except ValueError:
+            request_json = None
+
+    def get_param(name):
+        return (
+            request_json.get(name) if request_json else request.query_params.get(name)
+        )
+
+    text = get_param("text")
+
+    if not text:
+        return Response("Missing text", 400)
+
+    registry = request.app.state.registry
+
+    try:
+        headers = {"Vary": "Accept"}
+
+        plan = plan_request(registry, get_param, request.headers.get("Accept"))
+
+        audio_content, cached_fmt = await cache_io(cached_audio, plan)
+        if audio_content is not None:
+            audio_content, fmt = await transcode_cached(
+                audio_content, cached_fmt, plan.fmt, plan.voice, text
+            )
+
+            headers["X-Cache"] = "HIT"
+            return Response(audio_content, 200, headers, media_type=MIME_TYPES[fmt])
+
+        headers["X-Cache"] = "MISS"
+        media_type = MIME_TYPES[plan.native_fmt]
+
+        if plan.mode == "segment":
+            # each segment is cached on its own; the joined stream is not a
+            # single provider file, so it is not stored under the text's key
+            chunks = await text_to_speech_segments(registry, text, plan.voice, plan.fmt)
+
+            return StreamingResponse(chunks, 200, headers, media_type=media_type)
+
+        if plan.mode == "stream":
+            provider = registry.get(plan.voice.platform)
+            chunks = await provider.astream(
+                text, plan.voice.language, plan.voice.code, stream_chunk_size, plan.fmt
+            )
+
+            return StreamingResponse(
+                cache_stream(plan.key, chunks), 200, headers, media_type=media_type
+            )
+
+        audio_content, served_by = await registry.synthesize(
+            text, plan.voice, plan.backup, plan.fmt
+        )
+
+        served_fmt = await cache_io(
+            store_synthesized, registry, plan, served_by, audio_content
+        )
+
+        audio_content, served_fmt = await transcode_cached(
+            audio_content, served_fmt, plan.fmt, served_by, text
+        )
+
+        if plan.backup is not None:
+            headers["X-Hedge"] = "backup" if served_by == plan.backup else "primary"
+
+        return Response(audio_content, 200, headers, media_type=MIME_TYPES[served_fmt])
+    except ValueError as err:
+        return Response(str(err), 400)
+    except Exception as err:
+        return Response(f"Internal Server Error: {str(err)}", 500)
+
+
+@app.get("/cache/stats")
+async def cache_stats():
+    return JSONResponse({"audio": audio_cache.stats(), "auth": auth_cache.stats()})
+
+
+@app.get("/providers/stats")
+async def provider_stats(request: Request):
+    return JSONResponse(request.app.state.registry.stats())
+
+
+async def cache_io(func, *args):
+    # with a disk tier, cache lookups and writes may touch files, which must
+    # not block the event loop
+    if audio_cache.disk_dir is None:
+        return func(*args)
+    return await asyncio.to_thread(func, *args)
+
+
+async def transcode_cached(audio_content, source_fmt, target_fmt, voice, text):
+    if source_fmt == target_fmt:
+        return audio_content, source_fmt
+
+    # ffmpeg runs in a thread so it does not block the event loop
+    return await asyncio.to_thread(
+        synthesis.transcode_cached, audio_content, source_fmt, target_fmt, voice, text
+    )
+
+
+async def synthesize_cached(registry, text, voice, fmt=None):
+    key = segment_key(registry, voice, text, fmt)
+
+    audio_content = await cache_io(audio_cache.get, key)
+    if audio_content is not None:
+        return audio_content
+
+    provider = registry.get(voice.platform)
+    audio_content = await provider.synthesize(text, voice.language, voice.code, fmt)
+
+    await cache_io(audio_cache.put, key, audio_content)
+
+    return audio_content
+
+
+async def text_to_speech_segments(registry, text, voice, fmt=None):
+    tasks = schedule_segments(
+        registry,
+        text,
+        voice,
+        lambda segment: asyncio.create_task(
+            synthesize_cached(registry, segment, voice, fmt)
+        ),
+    )
+
+    try:
+        first = await tasks[0]
+    except Exception:
+        for task in tasks:
+            task.cancel()
+        raise
+
+    return stream_segments(first, tasks[1:])
+
+
+async def stream_segments(first, tasks):
+    try:
+        yield first
+        for task in tasks:
+            yield await task
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def cache_stream(key, chunks):
+    audio = []
+    async for chunk in chunks:
+        audio.append(chunk)
+        yield chunk
+
+    await cache_io(audio_cache.put, key, b"".join(audio))
+
+
+async def verify(client, token):
+    key = auth_key(token)
+
+    found, result = auth_cache.get(key)
+    if found:
+        return result
+
+    start = time.perf_counter()
+
+    response = await client.post(f"{authServiceUrl}/validate", json={"code": token})
+
+    return remember_validation(key, token, response, time.perf_counter() - start)
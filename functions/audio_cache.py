@@ -0,0 +1,209 @@
+import hashlib
+import os
+import threading
+import unicodedata
+from collections import OrderedDict
+
+
+def normalize_text(text):
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def cache_key(platform, language, code, text, fmt=None):
+    raw = "\x1f".join(
+        [platform or "", language or "", code or "", normalize_text(text)]
+    )
+    if fmt:
+        raw = f"{raw}\x1f{fmt}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class AudioCache:
+    """Byte-budgeted LRU of synthesized audio with an optional on-disk tier.
+
+    Entries are written through to disk (when ``disk_dir`` is set) so that a
+    memory eviction does not cost a provider call; the disk tier has its own
+    byte budget and evicts least recently used files. Files are read and
+    written outside the lock, which only guards the indexes.
+    """
+
+    def __init__(self, max_bytes, disk_dir=None, disk_max_bytes=0):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._size = 0
+        self._disk_entries = OrderedDict()
+        self._disk_size = 0
+        self._writing = set()
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_evictions = 0
+
+        if self.disk_dir and self.disk_max_bytes > 0:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            self._load_disk_index()
+        else:
+            self.disk_dir = None
+
+    def get(self, key):
+        with self._lock:
+            audio = self._entries.get(key)
+            if audio is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return audio
+
+            if not self.disk_dir or key not in self._disk_entries:
+                self.misses += 1
+                return None
+
+        audio = self._read_disk(key)
+
+        with self._lock:
+            if audio is None:
+                self._disk_size -= self._disk_entries.pop(key, 0)
+                self.misses += 1
+                return None
+
+            if key in self._disk_entries:
+                self._disk_entries.move_to_end(key)
+            self.disk_hits += 1
+            self._store_memory(key, audio)
+            return audio
+
+    def put(self, key, audio):
+        if not audio:
+            return
+
+        size = len(audio)
+
+        with self._lock:
+            self._store_memory(key, audio)
+            if (
+                not self.disk_dir
+                or size > self.disk_max_bytes
+                or key in self._disk_entries
+                or key in self._writing
+            ):
+                return
+            self._writing.add(key)
+
+        written = self._write_disk(key, audio)
+
+        with self._lock:
+            self._writing.discard(key)
+            if not written:
+                return
+            self._disk_entries[key] = size
+            self._disk_size += size
+            evicted = self._trim_disk()
+
+        self._remove_files(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_ratio": (
+                    (self.hits + self.disk_hits) / lookups if lookups else 0.0
+                ),
+                "evictions": self.evictions,
+                "disk_evictions": self.disk_evictions,
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "disk_entries": len(self._disk_entries),
+                "disk_bytes": self._disk_size,
+                "disk_max_bytes": self.disk_max_bytes if self.disk_dir else 0,
+            }
+
+    def _store_memory(self, key, audio):
+        size = len(audio)
+        if size > self.max_bytes:
+            return
+
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._size -= len(previous)
+
+        self._entries[key] = audio
+        self._size += size
+
+        while self._size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= len(evicted)
+            self.evictions += 1
+
+    def _path(self, key):
+        return os.path.join(self.disk_dir, key[:2], key)
+
+    def _write_disk(self, key, audio):
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, "wb") as f:
+                f.write(audio)
+            os.replace(tmp_path, path)
+        except OSError as err:
+            print(f"Error writing audio cache file {path}: {str(err)}")
+            return False
+        return True
+
+    def _trim_disk(self):
+        """Drop least recently used files from the index until it fits,
+        returning their paths to be removed once the lock is released."""
+        evicted = []
+        while self._disk_size > self.disk_max_bytes:
+            evicted_key, evicted_size = self._disk_entries.popitem(last=False)
+            self._disk_size -= evicted_size
+            self.disk_evictions += 1
+            evicted.append(self._path(evicted_key))
+        return evicted
+
+    def _remove_files(self, paths):
+        for path in paths:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _read_disk(self, key):
+        try:
+            with open(self._path(key), "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _load_disk_index(self):
+        files = []
+        for root, _, names in os.walk(self.disk_dir):
+            for name in names:
+                if name.endswith(".tmp"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                files.append((st.st_mtime, name, st.st_size))
+
+        for _, key, size in sorted(files):
+            self._disk_entries[key] = size
+            self._disk_size += size
+
+        self._remove_files(self._trim_disk())
@@ -0,0 +1,105 @@
+import os
+import shutil
+import subprocess
+
+MIME_TYPES = {
+    "ogg": "audio/ogg",
+    "mp3": "audio/mpeg",
+    "wav": "audio/wav",
+}
+
+ACCEPT_FORMATS = {
+    "audio/ogg": "ogg",
+    "audio/opus": "ogg",
+    "audio/mpeg": "mp3",
+    "audio/mp3": "mp3",
+    "audio/wav": "wav",
+    "audio/wave": "wav",
+    "audio/x-wav": "wav",
+}
+
+# formats that still play when files are joined back to back, so segments
+# can be streamed one after another; every wav segment has its own header
+CONCATENABLE_FORMATS = ("ogg", "mp3")
+
+FFMPEG_OUTPUT_ARGS = {
+    "ogg": ["-c:a", "libopus", "-f", "ogg"],
+    "mp3": ["-c:a", "libmp3lame", "-f", "mp3"],
+    "wav": ["-c:a", "pcm_s16le", "-f", "wav"],
+}
+
+
+def parse_accept(accept):
+    formats = []
+    for index, part in enumerate((accept or "").split(",")):
+        media_type, *params = [p.strip() for p in part.split(";")]
+        fmt = ACCEPT_FORMATS.get(media_type.lower())
+        if fmt is None:
+            continue
+
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+
+        if q > 0:
+            formats.append((-q, index, fmt))
+
+    return [fmt for _, _, fmt in sorted(formats)]
+
+
+def negotiate_format(requested, accept, native_formats):
+    """Pick the output format for a request.
+
+    An explicit ``format`` parameter wins. Otherwise the first acceptable
+    format the provider produces natively is preferred over one that would
+    need transcoding. Returns None when the client has no preference.
+    """
+    if requested:
+        requested = requested.lower()
+        if requested not in MIME_TYPES:
+            raise ValueError(f"Unsupported format: {requested}")
+        return requested
+
+    accepted = parse_accept(accept)
+    if not accepted:
+        return None
+
+    for fmt in accepted:
+        if fmt in native_formats:
+            return fmt
+
+    return accepted[0]
+
+
+def transcode(audio, target_fmt, timeout=10):
+    ffmpeg = shutil.which(os.getenv("FFMPEG_BIN", "ffmpeg"))
+    if not ffmpeg:
+        return None
+
+    try:
+        result = subprocess.run(
+            [
+                ffmpeg,
+                "-hide_banner",
+                "-loglevel",
+                "error",
+                "-i",
+                "pipe:0",
+                *FFMPEG_OUTPUT_ARGS[target_fmt],
+                "pipe:1",
+            ],
+            input=audio,
+            capture_output=True,
+            timeout=timeout,
+            check=True,
+        )
+    except (OSError, subprocess.SubprocessError) as err:
+        print(f"Error transcoding audio to {target_fmt}: {str(err)}")
+        return None
+
+    return result.stdout or None
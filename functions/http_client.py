@@ -0,0 +1,53 @@
+import os
+from http.cookiejar import DefaultCookiePolicy
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class ProviderClient:
+    """Keep-alive session shared by every outbound call of the function.
+
+    ``pool_connections`` is the number of per-host pools kept alive (one per
+    provider host is enough) and ``pool_maxsize`` the number of sockets kept
+    open per host, which should match the number of request threads.
+    """
+
+    def __init__(
+        self,
+        pool_connections=10,
+        pool_maxsize=10,
+        connect_timeout=5.0,
+        read_timeout=30.0,
+        max_retries=0,
+    ):
+        self.timeout = (connect_timeout, read_timeout)
+
+        self.session = requests.Session()
+        # provider responses should never leak state into each other
+        self.session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+
+        adapter = HTTPAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            max_retries=max_retries,
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            pool_connections=int(os.getenv("TTS_HTTP_POOL_CONNECTIONS", 10)),
+            pool_maxsize=int(os.getenv("TTS_HTTP_POOL_MAXSIZE", 10)),
+            connect_timeout=float(os.getenv("TTS_HTTP_CONNECT_TIMEOUT", 5)),
+            read_timeout=float(os.getenv("TTS_HTTP_READ_TIMEOUT", 30)),
+            max_retries=int(os.getenv("TTS_HTTP_MAX_RETRIES", 0)),
+        )
+
+    def post(self, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        return self.session.post(url, **kwargs)
+
+    def close(self):
+        self.session.close()
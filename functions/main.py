@@ -1,18 +1,51 @@
-import base64
-import json
+import asyncio
 import os
+import struct
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 import functions_framework
-import requests
-from flask import Flask, make_response, request
+from flask import Flask, Response, jsonify, make_response, request
+
+from audio_cache import cache_key
+from formats import MIME_TYPES
+from providers import Voice
+from synthesis import (
+    audio_cache,
+    auth_cache,
+    auth_key,
+    authFeatureFlag,
+    authServiceUrl,
+    cached_audio,
+    create_registry,
+    plan_request,
+    provider_client,
+    remember_validation,
+    schedule_segments,
+    segment_key,
+    store_synthesized,
+    stream_chunk_size,
+    transcode_cached,
+)
 
 app = Flask(__name__)
 
-api_key = os.getenv("GCLOUD_KEY")
-neet_api_key = os.getenv("NEETS_KEY")
-fish_api_key = os.getenv("FISH_KEY")
-authFeatureFlag = os.getenv("AUTH_FEATURE_FLAG")
-authServiceUrl = os.getenv("AUTH_SERVICE_URL")
+registry = create_registry()
+
+batch_max_items = int(os.getenv("TTS_BATCH_MAX_ITEMS", 50))
+batch_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("TTS_BATCH_WORKERS", 8)),
+    thread_name_prefix="tts-batch",
+)
+
+segment_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("TTS_SEGMENT_WORKERS", 4)),
+    thread_name_prefix="tts-segment",
+)
+
+# every batch item is framed as a big-endian uint16 status and uint32 length
+# followed by that many bytes of audio (or a UTF-8 error message)
+BATCH_FRAME_HEADER = struct.Struct(">HI")
 
 
 @functions_framework.http
@@ -37,7 +70,7 @@ def before_request_func():
             204,
             {
                 "Access-Control-Allow-Origin": "*",
-                "Access-Control-Allow-Methods": "GET",
+                "Access-Control-Allow-Methods": "GET, POST",
                 "Access-Control-Allow-Headers": "Content-Type, Authorization",
                 "Access-Control-Max-Age": "3600",
             },
@@ -50,9 +83,7 @@ def after_request_func(response):
     return response
 
 
-@app.route("/", methods=["GET"])
-def tts_req():
-
+def check_auth():
     if authFeatureFlag == "true":
         token = request.headers.get("Authorization")
 
@@ -61,38 +92,72 @@ def tts_req():
 
         code = token.split(" ")[1]
 
-        verify(code)
+        if verify(code) is None:
+            return make_response("Invalid token", 401)
+
+
+@app.route("/", methods=["GET"])
+def tts_req():
+
+    auth_error = check_auth()
+    if auth_error is not None:
+        return auth_error
 
     request_json = request.get_json(silent=True)
     request_args = request.args
 
-    text = request_json.get("text") if request_json else request_args.get("text")
+    def get_param(name):
+        return request_json.get(name) if request_json else request_args.get(name)
+
+    text = get_param("text")
 
     if not text:
         return make_response("Missing text", 400)
 
-    language = request_json.get("lang") if request_json else request_args.get("lang")
-    code = (
-        request_json.get("lang_code") if request_json else request_args.get("lang_code")
-    )
-    platform = (
-        request_json.get("platform") if request_json else request_args.get("platform")
-    )
-
     try:
-        headers = {}
-
-        headers["Content-Type"] = "audio/ogg"
-
-        audio_content = text_to_speech_api_key(
-            text,
-            api_key=api_key,
-            neet_api_key=neet_api_key,
-            fish_api_key=fish_api_key,
-            language=language.lower(),
-            code=(code.lower() if code else None),
-            platform=(platform.lower() if platform else None),
+        headers = {"Vary": "Accept"}
+
+        plan = plan_request(registry, get_param, request.headers.get("Accept"))
+
+        audio_content, cached_fmt = cached_audio(plan)
+        if audio_content is not None:
+            audio_content, fmt = transcode_cached(
+                audio_content, cached_fmt, plan.fmt, plan.voice, text
+            )
+
+            headers["Content-Type"] = MIME_TYPES[fmt]
+            headers["X-Cache"] = "HIT"
+            return make_response(audio_content, 200, headers)
+
+        headers["Content-Type"] = MIME_TYPES[plan.native_fmt]
+        headers["X-Cache"] = "MISS"
+
+        if plan.mode == "segment":
+            # each segment is cached on its own; the joined stream is not a
+            # single provider file, so it is not stored under the text's key
+            chunks = text_to_speech_segments(text, plan.voice, plan.fmt)
+
+            return Response(chunks, 200, headers)
+
+        if plan.mode == "stream":
+            chunks = text_to_speech_stream(text, plan.voice, plan.fmt)
+
+            return Response(cache_stream(plan.key, chunks), 200, headers)
+
+        audio_content, served_by = text_to_speech_api_key(
+            text, plan.voice, plan.backup, plan.fmt
+        )
+
+        served_fmt = store_synthesized(registry, plan, served_by, audio_content)
+
+        audio_content, served_fmt = transcode_cached(
+            audio_content, served_fmt, plan.fmt, served_by, text
         )
+
+        headers["Content-Type"] = MIME_TYPES[served_fmt]
+        if plan.backup is not None:
+            headers["X-Hedge"] = "backup" if served_by == plan.backup else "primary"
+
         return make_response(audio_content, 200, headers)
     except ValueError as err:
         return make_response(str(err), 400)
@@ -100,74 +165,173 @@ def tts_req():
         return make_response(f"Internal Server Error: {str(err)}", 500)
 
 
-def text_to_speech_api_key(
-    text,
-    api_key,
-    neet_api_key,
-    fish_api_key,
-    language="french",
-    code=None,
-    platform=None,
-):
-    url = f"https://texttospeech.googleapis.com/v1/text:synthesize?key={api_key}"
-    neet_url = "https://api.neets.ai/v1/tts"
-    fish_url = "https://api.fish.audio/v1/tts"
-
-    if platform == "gcloud":
-        voice = {"languageCode": code, "name": language}
-
-        payload = {
-            "input": {"text": text},
-            "voice": voice,
-            "audioConfig": {"audioEncoding": "OGG_OPUS"},
-        }
-
-        response = requests.post(
-            url, headers={"Content-Type": "application/json"}, data=json.dumps(payload)
-        )
+@app.route("/batch", methods=["POST"])
+def batch_req():
 
-        response.raise_for_status()
+    auth_error = check_auth()
+    if auth_error is not None:
+        return auth_error
 
-        return base64.b64decode(response.json().get("audioContent", ""))
+    request_json = request.get_json(silent=True)
 
-    elif platform == "fish":
-        payload = {"text": text, "reference_id": code, "format": "mp3"}
+    items = request_json.get("items") if isinstance(request_json, dict) else None
 
-        response = requests.post(
-            fish_url,
-            headers={
-                "Content-Type": "application/json",
-                "Authorization": f"Bearer {fish_api_key}",
-            },
-            json=payload,
-        )
+    if not isinstance(items, list) or not items:
+        return make_response("Missing items", 400)
 
-        response.raise_for_status()
+    if len(items) > batch_max_items:
+        return make_response(f"Too many items, max is {batch_max_items}", 400)
 
-        return response.content
+    futures = {}
+    order = []
 
-    elif platform == "neets":
-        data = {
-            "text": text,
-            "voice_id": language,
-            "params": {"model": "ar-diff-50k"},
-        }
-        response = requests.post(
-            neet_url,
-            headers={"Content-Type": "application/json", "X-API-Key": neet_api_key},
-            data=json.dumps(data),
-        )
-        response.raise_for_status()
-        return response.content
+    for item in items:
+        try:
+            text, voice = parse_batch_item(item)
+        except ValueError as err:
+            order.append(err)
+            continue
+
+        key = cache_key(*voice, text, registry.get(voice.platform).default_format)
+        if key not in futures:
+            futures[key] = batch_executor.submit(synthesize_cached, text, voice)
+        order.append(key)
+
+    headers = {
+        "Content-Type": "application/octet-stream",
+        "X-Batch-Count": str(len(order)),
+    }
+
+    return Response(stream_batch(order, futures), 200, headers)
+
+
+def parse_batch_item(item):
+    if not isinstance(item, dict):
+        raise ValueError("Item must be an object")
+
+    text = item.get("text")
+    language = item.get("lang")
+    code = item.get("lang_code")
+    platform = item.get("platform")
+
+    if not text or not isinstance(text, str):
+        raise ValueError("Missing text")
+
+    if not language or not isinstance(language, str):
+        raise ValueError("Missing lang")
+
+    voice = Voice(
+        platform.lower() if platform else None,
+        language.lower(),
+        code.lower() if code else None,
+    )
+
+    registry.get(voice.platform)
+
+    return text, voice
+
+
+def synthesize_cached(text, voice, fmt=None):
+    key = segment_key(registry, voice, text, fmt)
+
+    audio_content = audio_cache.get(key)
+    if audio_content is not None:
+        return audio_content
+
+    provider = registry.get(voice.platform)
+    audio_content = provider.synthesize_sync(text, voice.language, voice.code, fmt)
+
+    audio_cache.put(key, audio_content)
+
+    return audio_content
+
+
+def stream_batch(order, futures):
+    try:
+        for entry in order:
+            if isinstance(entry, ValueError):
+                status, body = 400, str(entry).encode()
+            else:
+                try:
+                    status, body = 200, futures[entry].result()
+                except Exception as err:
+                    status, body = 500, f"Internal Server Error: {str(err)}".encode()
+
+            yield BATCH_FRAME_HEADER.pack(status, len(body))
+            yield body
+    finally:
+        for future in futures.values():
+            future.cancel()
+
+
+@app.route("/cache/stats", methods=["GET"])
+def cache_stats():
+    return jsonify({"audio": audio_cache.stats(), "auth": auth_cache.stats()})
+
+
+@app.route("/providers/stats", methods=["GET"])
+def provider_stats():
+    return jsonify(registry.stats())
+
+
+def text_to_speech_api_key(text, voice, backup=None, fmt=None):
+    return asyncio.run(registry.synthesize(text, voice, backup, fmt))
+
+
+def text_to_speech_stream(text, voice, fmt=None):
+    provider = registry.get(voice.platform)
+
+    return provider.stream(text, voice.language, voice.code, stream_chunk_size, fmt)
+
+
+def text_to_speech_segments(text, voice, fmt=None):
+    futures = schedule_segments(
+        registry,
+        text,
+        voice,
+        lambda segment: segment_executor.submit(synthesize_cached, segment, voice, fmt),
+    )
+
+    # resolve the first segment before answering so provider errors still
+    # surface as a status code instead of a truncated body
+    try:
+        first = futures[0].result()
+    except Exception:
+        for future in futures:
+            future.cancel()
+        raise
+
+    return stream_segments(first, futures[1:])
+
+
+def stream_segments(first, futures):
+    try:
+        yield first
+        for future in futures:
+            yield future.result()
+    finally:
+        for future in futures:
+            future.cancel()
+
+
+def cache_stream(key, chunks):
+    audio = []
+    for chunk in chunks:
+        audio.append(chunk)
+        yield chunk
+
+    audio_cache.put(key, b"".join(audio))
 
 
 def verify(token):
-    response = requests.post(f"{authServiceUrl}/validate", json={"code": token})
+    key = auth_key(token)
 
-    response.raise_for_status()
+    found, result = auth_cache.get(key)
+    if found:
+        return result
 
-    user_id = response.json().get("user_id")
+    start = time.perf_counter()
 
-    print(f"Channel ID: {user_id} - Token: {token}")
+    response = provider_client.post(f"{authServiceUrl}/validate", json={"code": token})
 
-    return response.json()
+    return remember_validation(key, token, response, time.perf_counter() - start)
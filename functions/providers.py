@@ -0,0 +1,354 @@
+import asyncio
+import base64
+import json
+import threading
+import time
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from streaming import (
+    aiter_gcloud_response,
+    aiter_response,
+    iter_gcloud_response,
+    iter_response,
+)
+
+Voice = namedtuple("Voice", ["platform", "language", "code"])
+
+PROVIDERS = {}
+
+
+def register_provider(name):
+    def decorator(cls):
+        cls.name = name
+        PROVIDERS[name] = cls
+        return cls
+
+    return decorator
+
+
+class LatencyTracker:
+    def __init__(self, window=200):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, p):
+        with self._lock:
+            samples = sorted(self._samples)
+
+        if not samples:
+            return None
+
+        return samples[min(len(samples) - 1, int(len(samples) * p))]
+
+    def __len__(self):
+        return len(self._samples)
+
+
+class TTSProvider:
+    name = None
+    # output format -> the provider's own name for it
+    formats = {}
+    default_format = None
+
+    def __init__(self, client, api_key, executor=None, url=None, async_client=None):
+        self.client = client
+        self.api_key = api_key
+        self.executor = executor
+        self.async_client = async_client
+        if url:
+            self.url = url
+        self.latency = LatencyTracker()
+
+    def build_request(self, text, language, code, fmt):
+        raise NotImplementedError
+
+    def native_format(self, fmt):
+        return fmt if fmt in self.formats else self.default_format
+
+    def decode(self, response):
+        return response.content
+
+    def iter_audio(self, response, chunk_size):
+        return iter_response(response, chunk_size)
+
+    def aiter_audio(self, response, chunk_size):
+        return aiter_response(response, chunk_size)
+
+    def synthesize_sync(self, text, language, code, fmt=None):
+        url, headers, payload = self.build_request(
+            text, language, code, self.native_format(fmt)
+        )
+
+        start = time.perf_counter()
+
+        response = self.client.post(url, headers=headers, data=json.dumps(payload))
+
+        response.raise_for_status()
+
+        audio = self.decode(response)
+
+        self.latency.observe(time.perf_counter() - start)
+
+        return audio
+
+    async def synthesize_async(self, text, language, code, fmt=None):
+        url, headers, payload = self.build_request(
+            text, language, code, self.native_format(fmt)
+        )
+
+        start = time.perf_counter()
+
+        response = await self.async_client.post(
+            url, headers=headers, content=json.dumps(payload)
+        )
+
+        response.raise_for_status()
+
+        audio = self.decode(response)
+
+        self.latency.observe(time.perf_counter() - start)
+
+        return audio
+
+    async def synthesize(self, text, language, code, fmt=None):
+        if self.async_client is not None:
+            return await self.synthesize_async(text, language, code, fmt)
+
+        # a dedicated executor outlives the per-request event loop, so a
+        # losing hedge keeps running in the background instead of holding
+        # up asyncio.run's default executor shutdown
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.executor, self.synthesize_sync, text, language, code, fmt
+        )
+
+    def stream(self, text, language, code, chunk_size, fmt=None):
+        url, headers, payload = self.build_request(
+            text, language, code, self.native_format(fmt)
+        )
+
+        response = self.client.post(
+            url, headers=headers, data=json.dumps(payload), stream=True
+        )
+
+        try:
+            response.raise_for_status()
+        except Exception:
+            response.close()
+            raise
+
+        return self.iter_audio(response, chunk_size)
+
+    async def astream(self, text, language, code, chunk_size, fmt=None):
+        url, headers, payload = self.build_request(
+            text, language, code, self.native_format(fmt)
+        )
+
+        request = self.async_client.build_request(
+            "POST", url, headers=headers, content=json.dumps(payload)
+        )
+
+        response = await self.async_client.send(request, stream=True)
+
+        if response.is_error:
+            await response.aread()
+            await response.aclose()
+            response.raise_for_status()
+
+        return self.aiter_audio(response, chunk_size)
+
+
+@register_provider("gcloud")
+class GCloudProvider(TTSProvider):
+    url = "https://texttospeech.googleapis.com/v1/text:synthesize"
+    formats = {"ogg": "OGG_OPUS", "mp3": "MP3", "wav": "LINEAR16"}
+    default_format = "ogg"
+
+    def build_request(self, text, language, code, fmt):
+        voice = {"languageCode": code, "name": language}
+
+        payload = {
+            "input": {"text": text},
+            "voice": voice,
+            "audioConfig": {"audioEncoding": self.formats[fmt]},
+        }
+
+        url = f"{self.url}?key={self.api_key}"
+
+        return url, {"Content-Type": "application/json"}, payload
+
+    def decode(self, response):
+        return base64.b64decode(response.json().get("audioContent", ""))
+
+    def iter_audio(self, response, chunk_size):
+        return iter_gcloud_response(response, chunk_size)
+
+    def aiter_audio(self, response, chunk_size):
+        return aiter_gcloud_response(response, chunk_size)
+
+
+@register_provider("fish")
+class FishProvider(TTSProvider):
+    url = "https://api.fish.audio/v1/tts"
+    formats = {"mp3": "mp3", "wav": "wav"}
+    default_format = "mp3"
+
+    def build_request(self, text, language, code, fmt):
+        payload = {"text": text, "reference_id": code, "format": self.formats[fmt]}
+
+        headers = {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {self.api_key}",
+        }
+
+        return self.url, headers, payload
+
+
+@register_provider("neets")
+class NeetsProvider(TTSProvider):
+    url = "https://api.neets.ai/v1/tts"
+    formats = {"mp3": "mp3"}
+    default_format = "mp3"
+
+    def build_request(self, text, language, code, fmt):
+        data = {
+            "text": text,
+            "voice_id": language,
+            "params": {"model": "ar-diff-50k"},
+        }
+
+        headers = {"Content-Type": "application/json", "X-API-Key": self.api_key}
+
+        return self.url, headers, data
+
+
+class ProviderRegistry:
+    """Owns one instance per registered provider so latency history survives
+    across requests, and implements hedged synthesis on top of them."""
+
+    def __init__(
+        self,
+        client,
+        api_keys,
+        urls=None,
+        hedge_percentile=0.95,
+        hedge_min_delay=0.2,
+        hedge_max_delay=2.0,
+        hedge_min_samples=20,
+        max_workers=16,
+        async_client=None,
+    ):
+        self.client = client
+        self.async_client = async_client
+        self.api_keys = api_keys
+        self.urls = urls or {}
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="tts-provider"
+        )
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_max_delay = hedge_max_delay
+        self.hedge_min_samples = hedge_min_samples
+
+        self._providers = {}
+        self._lock = threading.Lock()
+
+        self.hedges_fired = 0
+        self.hedges_won = 0
+
+    def get(self, platform):
+        provider = self._providers.get(platform)
+        if provider is not None:
+            return provider
+
+        provider_cls = PROVIDERS.get(platform)
+        if provider_cls is None:
+            raise ValueError(f"Unsupported platform: {platform}")
+
+        with self._lock:
+            if platform not in self._providers:
+                self._providers[platform] = provider_cls(
+                    self.client,
+                    self.api_keys.get(platform),
+                    self.executor,
+                    self.urls.get(platform),
+                    self.async_client,
+                )
+            return self._providers[platform]
+
+    def hedge_delay(self, provider):
+        if len(provider.latency) < self.hedge_min_samples:
+            return self.hedge_max_delay
+
+        p = provider.latency.percentile(self.hedge_percentile)
+
+        return min(self.hedge_max_delay, max(self.hedge_min_delay, p))
+
+    async def synthesize(self, text, voice, backup=None, fmt=None):
+        primary = self.get(voice.platform)
+
+        if backup is None:
+            return (
+                await primary.synthesize(text, voice.language, voice.code, fmt),
+                voice,
+            )
+
+        secondary = self.get(backup.platform)
+
+        primary_task = asyncio.create_task(
+            primary.synthesize(text, voice.language, voice.code, fmt)
+        )
+
+        done, _ = await asyncio.wait({primary_task}, timeout=self.hedge_delay(primary))
+
+        if done and primary_task.exception() is None:
+            return primary_task.result(), voice
+
+        self.hedges_fired += 1
+
+        backup_task = asyncio.create_task(
+            secondary.synthesize(text, backup.language, backup.code, fmt)
+        )
+
+        voices = {primary_task: voice, backup_task: backup}
+        pending = set(voices) - done
+        error = primary_task.exception() if done else None
+
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                if task.exception() is not None:
+                    error = error or task.exception()
+                    continue
+
+                for task_left in pending:
+                    task_left.cancel()
+
+                if task is backup_task:
+                    self.hedges_won += 1
+
+                return task.result(), voices[task]
+
+        raise error
+
+    def stats(self):
+        return {
+            "hedges_fired": self.hedges_fired,
+            "hedges_won": self.hedges_won,
+            "providers": {
+                name: {
+                    "samples": len(provider.latency),
+                    "p50": provider.latency.percentile(0.5),
+                    "p95": provider.latency.percentile(0.95),
+                    "hedge_delay": self.hedge_delay(provider),
+                }
+                for name, provider in self._providers.items()
+            },
+        }
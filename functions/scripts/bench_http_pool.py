@@ -0,0 +1,72 @@
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from http_client import ProviderClient  # noqa: E402
+from stub_provider import StubConfig, start_in_thread  # noqa: E402
+
+
+def run(label, post, url, requests_count):
+    payload = json.dumps({"text": "hello chat", "reference_id": "stub"})
+    headers = {"Content-Type": "application/json"}
+
+    # warm up so the pooled client starts with an open connection, which is
+    # the steady state of a warm function instance
+    post(url, headers=headers, data=payload).raise_for_status()
+
+    timings = []
+    for _ in range(requests_count):
+        start = time.perf_counter()
+        response = post(url, headers=headers, data=payload)
+        response.raise_for_status()
+        response.content
+        timings.append((time.perf_counter() - start) * 1000)
+
+    timings.sort()
+    print(
+        f"{label:<8} n={requests_count} "
+        f"mean={statistics.mean(timings):.3f}ms "
+        f"p50={timings[len(timings) // 2]:.3f}ms "
+        f"p95={timings[int(len(timings) * 0.95) - 1]:.3f}ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare bare requests.post with the pooled ProviderClient"
+    )
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument(
+        "--url",
+        help="Provider URL to hit instead of the bundled local stub server",
+    )
+    args = parser.parse_args()
+
+    server = None
+    url = args.url
+    if not url:
+        config = StubConfig(latency_ms=0, latency_dist="fixed", payload_bytes=4096)
+        server = start_in_thread(config)
+        url = f"http://127.0.0.1:{server.server_address[1]}/v1/tts"
+
+    client = ProviderClient.from_env()
+
+    try:
+        run("bare", requests.post, url, args.requests)
+        run("pooled", client.post, url, args.requests)
+    finally:
+        client.close()
+        if server:
+            server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,280 @@
+import argparse
+import itertools
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from stub_provider import (  # noqa: E402
+    add_arguments,
+    config_from_args,
+    provider_env,
+    start_in_thread,
+)
+
+FUNCTIONS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SPAWN_COMMANDS = {
+    "wsgi": lambda port: [
+        sys.executable,
+        "-m",
+        "functions_framework",
+        "--target",
+        "main",
+        "--source",
+        os.path.join(FUNCTIONS_DIR, "main.py"),
+        "--port",
+        str(port),
+    ],
+    "asgi": lambda port: [
+        sys.executable,
+        "-m",
+        "uvicorn",
+        "asgi:app",
+        "--port",
+        str(port),
+        "--no-access-log",
+    ],
+}
+
+
+def read_rss_mb(pid):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+class MemorySampler(threading.Thread):
+    def __init__(self, pid, interval=0.25):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.peak = None
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            rss = read_rss_mb(self.pid)
+            if rss is not None:
+                self.peak = rss if self.peak is None else max(self.peak, rss)
+            self._stop_event.wait(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+        return self.peak
+
+
+def percentile(samples, p):
+    if not samples:
+        return 0.0
+    return samples[min(len(samples) - 1, int(len(samples) * p))]
+
+
+def run_level(url, params, concurrency, duration, cache_hit_ratio, counter):
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def worker():
+        session = requests.Session()
+        local_latencies = []
+        local_errors = 0
+
+        while time.perf_counter() < deadline:
+            n = next(counter)
+            request_params = dict(params)
+            # a fixed fraction of requests reuse one phrase so cache behaviour
+            # can be dialled in; everything else is unique text
+            if (n % 100) >= cache_hit_ratio * 100:
+                request_params["text"] = f"{params['text']} {n}"
+
+            start = time.perf_counter()
+            try:
+                response = session.get(url, params=request_params)
+                response.content
+                ok = response.status_code == 200
+            except requests.RequestException:
+                ok = False
+
+            local_latencies.append((time.perf_counter() - start) * 1000)
+            if not ok:
+                local_errors += 1
+
+        with lock:
+            latencies.extend(local_latencies)
+            errors.append(local_errors)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": sum(errors),
+        "rps": len(latencies) / elapsed if elapsed else 0.0,
+        "p50": percentile(latencies, 0.50),
+        "p95": percentile(latencies, 0.95),
+        "p99": percentile(latencies, 0.99),
+    }
+
+
+def wait_until_ready(url, process, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("TTS server exited during startup")
+        try:
+            requests.get(f"{url}/cache/stats", timeout=1)
+            return
+        except requests.RequestException:
+            time.sleep(0.2)
+    raise RuntimeError(f"TTS server at {url} did not become ready")
+
+
+def spawn_server(kind, port, stub):
+    env = dict(os.environ)
+    env.update(provider_env(stub))
+    env.setdefault("GCLOUD_KEY", "stub")
+    env.setdefault("FISH_KEY", "stub")
+    env.setdefault("NEETS_KEY", "stub")
+    env["AUTH_FEATURE_FLAG"] = "false"
+
+    process = subprocess.Popen(
+        SPAWN_COMMANDS[kind](port),
+        cwd=FUNCTIONS_DIR,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+    url = f"http://127.0.0.1:{port}"
+    try:
+        wait_until_ready(url, process)
+    except Exception:
+        process.terminate()
+        raise
+
+    return url, process
+
+
+def print_results(label, results):
+    print(f"\n{label}")
+    print(
+        f"{'conc':>5} {'reqs':>7} {'errs':>5} {'rps':>9} "
+        f"{'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'rss MB':>8}"
+    )
+    for r in results:
+        rss = f"{r['rss_mb']:.1f}" if r.get("rss_mb") is not None else "n/a"
+        print(
+            f"{r['concurrency']:>5} {r['requests']:>7} {r['errors']:>5} "
+            f"{r['rps']:>9.1f} {r['p50']:>9.1f} {r['p95']:>9.1f} "
+            f"{r['p99']:>9.1f} {rss:>8}"
+        )
+
+
+def run_suite(url, pid, args):
+    params = {"text": args.text, "lang": args.lang, "platform": args.platform}
+    if args.lang_code:
+        params["lang_code"] = args.lang_code
+    for extra in args.param:
+        key, _, value = extra.partition("=")
+        params[key] = value
+
+    counter = itertools.count()
+    results = []
+    for concurrency in args.concurrency:
+        sampler = MemorySampler(pid) if pid else None
+        if sampler:
+            sampler.start()
+
+        result = run_level(
+            f"{url}{args.path}",
+            params,
+            concurrency,
+            args.duration,
+            args.cache_hit_ratio,
+            counter,
+        )
+
+        result["rss_mb"] = sampler.stop() if sampler else None
+        results.append(result)
+
+    return results
+
+
+def parse_args(argv=None, spawn_choices=None):
+    parser = argparse.ArgumentParser(
+        description="Load test the TTS function against the local stub provider"
+    )
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--url", help="Base URL of an already running TTS server")
+    target.add_argument(
+        "--spawn",
+        nargs="+",
+        choices=sorted(spawn_choices or SPAWN_COMMANDS),
+        help="Start the given server(s) against an in-process stub provider",
+    )
+    parser.add_argument("--pid", type=int, help="PID of --url server, for RSS")
+    parser.add_argument("--port", type=int, default=8181)
+    parser.add_argument(
+        "--concurrency",
+        type=lambda v: [int(c) for c in v.split(",")],
+        default=[1, 4, 16, 64],
+    )
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--path", default="/")
+    parser.add_argument("--platform", default="fish")
+    parser.add_argument("--lang", default="stub")
+    parser.add_argument("--lang-code", default="stub")
+    parser.add_argument("--text", default="hello chat this is a load test")
+    parser.add_argument("--cache-hit-ratio", type=float, default=0.0)
+    parser.add_argument(
+        "--param",
+        action="append",
+        default=[],
+        help="Extra key=value query parameter, e.g. --param stream=true",
+    )
+    add_arguments(parser)
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parse_args()
+
+    if args.url:
+        print_results(args.url, run_suite(args.url.rstrip("/"), args.pid, args))
+        return
+
+    stub = start_in_thread(config_from_args(args))
+    try:
+        for kind in args.spawn:
+            url, process = spawn_server(kind, args.port, stub)
+            try:
+                print_results(kind, run_suite(url, process.pid, args))
+            finally:
+                process.terminate()
+                process.wait()
+    finally:
+        stub.shutdown()
+
+
+if __name__ == "__main__":
+    main()
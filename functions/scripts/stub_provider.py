@@ -0,0 +1,189 @@
+import argparse
+import base64
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubConfig:
+    def __init__(
+        self,
+        latency_ms=150.0,
+        latency_jitter_ms=50.0,
+        latency_dist="lognormal",
+        payload_bytes=32 * 1024,
+        bytes_per_char=0,
+        error_rate=0.0,
+        error_status=503,
+        seed=None,
+    ):
+        self.latency_ms = latency_ms
+        self.latency_jitter_ms = latency_jitter_ms
+        self.latency_dist = latency_dist
+        self.payload_bytes = payload_bytes
+        self.bytes_per_char = bytes_per_char
+        self.error_rate = error_rate
+        self.error_status = error_status
+
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def latency(self):
+        with self._lock:
+            if self.latency_dist == "fixed":
+                ms = self.latency_ms
+            elif self.latency_dist == "uniform":
+                ms = self._random.uniform(
+                    self.latency_ms - self.latency_jitter_ms,
+                    self.latency_ms + self.latency_jitter_ms,
+                )
+            elif self.latency_dist == "normal":
+                ms = self._random.gauss(self.latency_ms, self.latency_jitter_ms)
+            else:
+                # long right tail, which is what provider brownouts look like
+                sigma = self.latency_jitter_ms / max(self.latency_ms, 1.0)
+                ms = self.latency_ms * self._random.lognormvariate(0, sigma)
+
+        return max(ms, 0.0) / 1000
+
+    def should_fail(self):
+        with self._lock:
+            return self._random.random() < self.error_rate
+
+    def payload_size(self, text):
+        if self.bytes_per_char:
+            return max(1, len(text) * self.bytes_per_char)
+        return self.payload_bytes
+
+
+def make_handler(config):
+    class StubProviderHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+            try:
+                payload = json.loads(body or b"{}")
+            except ValueError:
+                payload = {}
+
+            text = payload.get("text") or payload.get("input", {}).get("text", "")
+
+            time.sleep(config.latency())
+
+            if config.should_fail():
+                self._send(config.error_status, "text/plain", b"stub provider error")
+                return
+
+            audio = b"\0" * config.payload_size(text)
+
+            if self.path.startswith("/v1/text:synthesize"):
+                data = json.dumps(
+                    {"audioContent": base64.b64encode(audio).decode()}
+                ).encode()
+                self._send(200, "application/json", data)
+            else:
+                self._send(200, "audio/mpeg", audio)
+
+        def _send(self, status, content_type, data):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    return StubProviderHandler
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # the socketserver default backlog of 5 turns high concurrency into SYN
+    # retransmits, which would show up as fake multi-second tail latency
+    request_queue_size = 1024
+
+
+def make_server(config, host="127.0.0.1", port=0):
+    return StubServer((host, port), make_handler(config))
+
+
+def start_in_thread(config, host="127.0.0.1", port=0):
+    server = make_server(config, host, port)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def provider_env(server):
+    host, port = server.server_address[:2]
+    base = f"http://{host}:{port}"
+    return {
+        "GCLOUD_TTS_URL": f"{base}/v1/text:synthesize",
+        "FISH_TTS_URL": f"{base}/fish/v1/tts",
+        "NEETS_TTS_URL": f"{base}/neets/v1/tts",
+    }
+
+
+def add_arguments(parser):
+    parser.add_argument("--latency-ms", type=float, default=150.0)
+    parser.add_argument("--latency-jitter-ms", type=float, default=50.0)
+    parser.add_argument(
+        "--latency-dist",
+        choices=["fixed", "uniform", "normal", "lognormal"],
+        default="lognormal",
+    )
+    parser.add_argument("--payload-bytes", type=int, default=32 * 1024)
+    parser.add_argument(
+        "--bytes-per-char",
+        type=int,
+        default=0,
+        help="Scale the payload with the text length instead of --payload-bytes",
+    )
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--seed", type=int)
+
+
+def config_from_args(args):
+    return StubConfig(
+        latency_ms=args.latency_ms,
+        latency_jitter_ms=args.latency_jitter_ms,
+        latency_dist=args.latency_dist,
+        payload_bytes=args.payload_bytes,
+        bytes_per_char=args.bytes_per_char,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        seed=args.seed,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Fake Google/Fish/Neets TTS provider for local load tests"
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    server = make_server(config_from_args(args), args.host, args.port)
+
+    print("Point the TTS function at the stub with:")
+    for name, value in provider_env(server).items():
+        print(f"  export {name}={value}")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
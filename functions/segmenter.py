@@ -0,0 +1,64 @@
+import re
+
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?…。！？])\s+")
+CLAUSE_BOUNDARY = re.compile(r"(?<=[,;:，；、])\s+")
+
+
+def split_text(text, max_chars=200, min_chars=40):
+    """Split text at sentence, then clause, then word boundaries.
+
+    Pieces longer than ``max_chars`` are broken down further and pieces
+    shorter than ``min_chars`` are merged into their neighbour so a message
+    full of "lol. lmao. wow." does not turn into a dozen provider calls.
+    """
+    text = " ".join(text.split())
+    if not text:
+        return []
+
+    pieces = []
+    for sentence in SENTENCE_BOUNDARY.split(text):
+        if len(sentence) <= max_chars:
+            pieces.append(sentence)
+            continue
+
+        for clause in CLAUSE_BOUNDARY.split(sentence):
+            pieces.extend(_split_words(clause, max_chars))
+
+    segments = []
+    for piece in pieces:
+        if (
+            segments
+            and (len(segments[-1]) < min_chars or len(piece) < min_chars)
+            and len(segments[-1]) + len(piece) + 1 <= max_chars
+        ):
+            segments[-1] = f"{segments[-1]} {piece}"
+        else:
+            segments.append(piece)
+
+    return segments
+
+
+def _split_words(text, max_chars):
+    if len(text) <= max_chars:
+        return [text]
+
+    pieces = []
+    current = ""
+    for word in text.split(" "):
+        while len(word) > max_chars:
+            if current:
+                pieces.append(current)
+                current = ""
+            pieces.append(word[:max_chars])
+            word = word[max_chars:]
+
+        if current and len(current) + len(word) + 1 > max_chars:
+            pieces.append(current)
+            current = word
+        else:
+            current = f"{current} {word}" if current else word
+
+    if current:
+        pieces.append(current)
+
+    return pieces
@@ -0,0 +1,95 @@
+import base64
+import re
+
+AUDIO_CONTENT_KEY = b'"audioContent"'
+AUDIO_CONTENT_VALUE = re.compile(rb'\s*:\s*"')
+AUDIO_CONTENT_PARTIAL = re.compile(rb"\s*(:\s*)?")
+
+
+class GCloudAudioDecoder:
+    """Incrementally decodes ``audioContent`` out of a text:synthesize body.
+
+    Google returns ``{"audioContent": "<base64>"}``; bytes are decoded in
+    4-character groups as soon as they arrive instead of waiting for the
+    full JSON document.
+    """
+
+    def __init__(self):
+        self._buffer = b""
+        self._pending = b""
+        self._state = "key"
+
+    def feed(self, chunk):
+        if self._state == "done":
+            return b""
+
+        self._buffer += chunk
+
+        if self._state == "key":
+            idx = self._buffer.find(AUDIO_CONTENT_KEY)
+            if idx == -1:
+                self._buffer = self._buffer[-(len(AUDIO_CONTENT_KEY) - 1) :]
+                return b""
+
+            rest = self._buffer[idx + len(AUDIO_CONTENT_KEY) :]
+            match = AUDIO_CONTENT_VALUE.match(rest)
+            if not match:
+                if AUDIO_CONTENT_PARTIAL.fullmatch(rest):
+                    self._buffer = self._buffer[idx:]
+                    return b""
+                raise ValueError("Unexpected response from text:synthesize")
+
+            self._buffer = rest[match.end() :]
+            self._state = "value"
+
+        end = self._buffer.find(b'"')
+        if end == -1:
+            data, self._buffer = self._buffer, b""
+        else:
+            data, self._buffer = self._buffer[:end], b""
+            self._state = "done"
+
+        # base64 never contains a backslash, so this only undoes "\/" escapes
+        data = self._pending + data.replace(b"\\", b"")
+
+        if self._state == "done":
+            self._pending = b""
+            return base64.b64decode(data)
+
+        usable = len(data) - len(data) % 4
+        self._pending = data[usable:]
+        return base64.b64decode(data[:usable])
+
+
+def iter_response(response, chunk_size):
+    try:
+        for chunk in response.iter_content(chunk_size=chunk_size):
+            if chunk:
+                yield chunk
+    finally:
+        response.close()
+
+
+def iter_gcloud_response(response, chunk_size):
+    decoder = GCloudAudioDecoder()
+    for chunk in iter_response(response, chunk_size):
+        audio = decoder.feed(chunk)
+        if audio:
+            yield audio
+
+
+async def aiter_response(response, chunk_size):
+    try:
+        async for chunk in response.aiter_bytes(chunk_size):
+            if chunk:
+                yield chunk
+    finally:
+        await response.aclose()
+
+
+async def aiter_gcloud_response(response, chunk_size):
+    decoder = GCloudAudioDecoder()
+    async for chunk in aiter_response(response, chunk_size):
+        audio = decoder.feed(chunk)
+        if audio:
+            yield audio
@@ -0,0 +1,211 @@
+import hashlib
+import os
+from typing import NamedTuple, Optional
+
+from audio_cache import AudioCache, cache_key
+from formats import CONCATENABLE_FORMATS, negotiate_format, transcode
+from http_client import ProviderClient
+from providers import ProviderRegistry, Voice
+from segmenter import split_text
+from ttl_cache import TTLCache
+
+# Request handling shared by the Flask (main.py) and ASGI (asgi.py) entry
+# points; they only add the provider calls and how they wait for them.
+
+api_key = os.getenv("GCLOUD_KEY")
+neet_api_key = os.getenv("NEETS_KEY")
+fish_api_key = os.getenv("FISH_KEY")
+authFeatureFlag = os.getenv("AUTH_FEATURE_FLAG")
+authServiceUrl = os.getenv("AUTH_SERVICE_URL")
+
+audio_cache = AudioCache(
+    max_bytes=int(os.getenv("TTS_CACHE_MAX_BYTES", 64 * 1024 * 1024)),
+    disk_dir=os.getenv("TTS_CACHE_DIR"),
+    disk_max_bytes=int(os.getenv("TTS_CACHE_DISK_MAX_BYTES", 512 * 1024 * 1024)),
+)
+
+auth_cache = TTLCache(
+    ttl=float(os.getenv("TTS_AUTH_CACHE_TTL", 300)),
+    negative_ttl=float(os.getenv("TTS_AUTH_CACHE_NEGATIVE_TTL", 30)),
+    max_entries=int(os.getenv("TTS_AUTH_CACHE_MAX_ENTRIES", 1024)),
+)
+
+provider_client = ProviderClient.from_env()
+
+stream_chunk_size = int(os.getenv("TTS_STREAM_CHUNK_SIZE", 16 * 1024))
+
+segment_min_chars = int(os.getenv("TTS_SEGMENT_MIN_CHARS", 40))
+segment_max_chars = int(os.getenv("TTS_SEGMENT_MAX_CHARS", 200))
+
+
+def create_registry(async_client=None):
+    return ProviderRegistry(
+        provider_client,
+        {"gcloud": api_key, "fish": fish_api_key, "neets": neet_api_key},
+        urls={
+            "gcloud": os.getenv("GCLOUD_TTS_URL"),
+            "fish": os.getenv("FISH_TTS_URL"),
+            "neets": os.getenv("NEETS_TTS_URL"),
+        },
+        hedge_percentile=float(os.getenv("TTS_HEDGE_PERCENTILE", 0.95)),
+        hedge_min_delay=float(os.getenv("TTS_HEDGE_MIN_DELAY", 0.2)),
+        hedge_max_delay=float(os.getenv("TTS_HEDGE_MAX_DELAY", 2.0)),
+        max_workers=int(os.getenv("TTS_PROVIDER_WORKERS", 16)),
+        async_client=async_client,
+    )
+
+
+class Plan(NamedTuple):
+    text: str
+    voice: Voice
+    backup: Optional[Voice]
+    fmt: str
+    native_fmt: str
+    key: str
+    # "segment", "stream" or "synthesize"
+    mode: str
+
+
+def plan_request(registry, get_param, accept):
+    """Voices, output format and synthesis mode for a request.
+
+    Raises ValueError for unknown platforms and unsupported formats.
+    """
+    text = get_param("text")
+    voice, backup = parse_voices(get_param)
+
+    provider = registry.get(voice.platform)
+    fmt = (
+        negotiate_format(get_param("format"), accept, provider.formats)
+        or provider.default_format
+    )
+    native_fmt = provider.native_format(fmt)
+
+    mode = "synthesize"
+    if fmt == native_fmt:
+        if (
+            fmt in CONCATENABLE_FORMATS
+            and is_enabled(get_param("segment"))
+            and len(text) > segment_min_chars
+        ):
+            mode = "segment"
+        elif is_enabled(get_param("stream")):
+            mode = "stream"
+
+    return Plan(
+        text, voice, backup, fmt, native_fmt, cache_key(*voice, text, fmt), mode
+    )
+
+
+def cached_audio(plan):
+    """Cached audio for the plan and its format, which may be the provider's
+    native format when only that was cached."""
+    audio_content = audio_cache.get(plan.key)
+    if audio_content is not None:
+        return audio_content, plan.fmt
+
+    if plan.native_fmt != plan.fmt:
+        native_key = cache_key(*plan.voice, plan.text, plan.native_fmt)
+        audio_content = audio_cache.get(native_key)
+        if audio_content is not None:
+            return audio_content, plan.native_fmt
+
+    return None, None
+
+
+def store_synthesized(registry, plan, served_by, audio_content):
+    """Cache what a provider returned, returning the format it is in."""
+    served_fmt = registry.get(served_by.platform).native_format(plan.fmt)
+    audio_cache.put(cache_key(*served_by, plan.text, served_fmt), audio_content)
+    return served_fmt
+
+
+def transcode_cached(audio_content, source_fmt, target_fmt, voice, text):
+    if source_fmt == target_fmt:
+        return audio_content, source_fmt
+
+    transcoded = transcode(audio_content, target_fmt)
+
+    # without ffmpeg the original is still playable, it is just labelled with
+    # the format it actually is
+    if transcoded is None:
+        return audio_content, source_fmt
+
+    audio_cache.put(cache_key(*voice, text, target_fmt), transcoded)
+
+    return transcoded, target_fmt
+
+
+def segment_key(registry, voice, text, fmt=None):
+    return cache_key(*voice, text, registry.get(voice.platform).native_format(fmt))
+
+
+def schedule_segments(registry, text, voice, submit):
+    """Call ``submit(segment)`` once per distinct segment of the text and
+    return its results in segment order."""
+    registry.get(voice.platform)
+
+    segments = split_text(
+        text, max_chars=segment_max_chars, min_chars=segment_min_chars
+    )
+
+    unique = {}
+    jobs = []
+    for segment in segments:
+        if segment not in unique:
+            unique[segment] = submit(segment)
+        jobs.append(unique[segment])
+    return jobs
+
+
+def parse_voices(get_param):
+    language = get_param("lang")
+    code = get_param("lang_code")
+    platform = get_param("platform")
+
+    hedge_language = get_param("hedge_lang")
+    hedge_code = get_param("hedge_lang_code")
+    hedge_platform = get_param("hedge_platform")
+
+    voice = Voice(
+        platform.lower() if platform else None,
+        language.lower(),
+        code.lower() if code else None,
+    )
+
+    backup = None
+    if hedge_platform:
+        backup = Voice(
+            hedge_platform.lower(),
+            hedge_language.lower() if hedge_language else voice.language,
+            hedge_code.lower() if hedge_code else None,
+        )
+
+    return voice, backup
+
+
+def is_enabled(value):
+    return str(value).lower() in ("1", "true")
+
+
+def auth_key(token):
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def remember_validation(key, token, response, elapsed):
+    """Cache the auth service's answer for ``token`` and return it."""
+    auth_cache.observe_upstream(elapsed)
+
+    if response.status_code in (400, 401, 403):
+        auth_cache.set(key, None)
+        return None
+
+    response.raise_for_status()
+
+    user_id = response.json().get("user_id")
+
+    print(f"Channel ID: {user_id} - Token: {token}")
+
+    auth_cache.set(key, response.json())
+
+    return response.json()
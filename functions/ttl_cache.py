@@ -0,0 +1,90 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """Size-capped TTL cache that tracks how much upstream latency it saved.
+
+    ``saved_seconds`` assumes every hit would have cost the mean latency of
+    the lookups that actually went upstream.
+    """
+
+    def __init__(self, ttl, max_entries, negative_ttl=None):
+        self.ttl = ttl
+        self.negative_ttl = ttl if negative_ttl is None else negative_ttl
+        self.max_entries = max_entries
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._upstream_calls = 0
+        self._upstream_seconds = 0.0
+
+    def get(self, key):
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    if value is None:
+                        self.negative_hits += 1
+                    else:
+                        self.hits += 1
+                    return True, value
+
+                del self._entries[key]
+
+            self.misses += 1
+            return False, None
+
+    def set(self, key, value):
+        ttl = self.negative_ttl if value is None else self.ttl
+        if ttl <= 0 or self.max_entries <= 0:
+            return
+
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def observe_upstream(self, seconds):
+        with self._lock:
+            self._upstream_calls += 1
+            self._upstream_seconds += seconds
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            hits = self.hits + self.negative_hits
+            lookups = hits + self.misses
+            mean_upstream = (
+                self._upstream_seconds / self._upstream_calls
+                if self._upstream_calls
+                else 0.0
+            )
+            return {
+                "hits": self.hits,
+                "negative_hits": self.negative_hits,
+                "misses": self.misses,
+                "hit_ratio": hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "mean_upstream_seconds": mean_upstream,
+                "saved_seconds": hits * mean_upstream,
+            }
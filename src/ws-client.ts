@@ -8,29 +8,61 @@ export class WsClient {
   private onCloseCallback: (() => void) | null = null;
   private onErrorCallback: ((error: Error) => void) | null = null;
   private onOpenCallback: (() => void) | null = null;
+  // last sequence number seen, so a reconnect can ask for what it missed
+  private lastSeq: number | null = null;
+  // tells the server this overlay is alive, so idle sockets can be reaped
+  private heartbeatInterval: number;
+  private heartbeat: ReturnType<typeof setInterval> | null = null;
 
-  constructor(url: string, token: string, reconnectInterval: number = 3000) {
+  constructor(
+    url: string,
+    token: string,
+    reconnectInterval: number = 3000,
+    heartbeatInterval: number = 30000
+  ) {
     this.url = url;
     this.reconnectInterval = reconnectInterval;
+    this.heartbeatInterval = heartbeatInterval;
     this.token = token;
   }
 
   private connect() {
-    this.ws = new WebSocket(`${this.url}?token=${this.token}`);
+    const replay = this.lastSeq === null ? "seq=1" : `since=${this.lastSeq}`;
+
+    this.ws = new WebSocket(`${this.url}?token=${this.token}&${replay}`);
 
     this.ws.onmessage = (event) => {
+      const { seq, message } = JSON.parse(event.data as string) as {
+        seq: number;
+        message: string;
+      };
+
+      if (this.lastSeq !== null && seq <= this.lastSeq) {
+        return;
+      }
+      this.lastSeq = seq;
+
       if (this.onMessageCallback) {
-        this.onMessageCallback(event.data as string);
+        this.onMessageCallback(message);
       }
     };
 
     this.ws.onopen = () => {
+      this.stopHeartbeat();
+      const ws = this.ws;
+      this.heartbeat = setInterval(() => {
+        if (ws && ws.readyState === WebSocket.OPEN) {
+          ws.send("ping");
+        }
+      }, this.heartbeatInterval);
+
       if (this.onOpenCallback) {
         this.onOpenCallback();
       }
     };
 
     this.ws.onclose = () => {
+      this.stopHeartbeat();
       if (this.onCloseCallback) {
         this.onCloseCallback();
       }
@@ -80,6 +112,13 @@ export class WsClient {
   //   }
   // }
 
+  private stopHeartbeat() {
+    if (this.heartbeat !== null) {
+      clearInterval(this.heartbeat);
+      this.heartbeat = null;
+    }
+  }
+
   public async start() {
     // this.token = await this.getAuthToken();
     this.connect();
@@ -0,0 +1,77 @@
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from fastapi import HTTPException
+from jose import JWTError, jwk, jwt
+
+logger = logging.getLogger(__name__)
+
+
+class TokenVerifier:
+    """RS256 verification with the public key parsed once and verified
+    claims cached by token digest.
+
+    Entries live until the token's ``exp`` or ``cache_ttl`` seconds,
+    whichever comes first; ``cache_ttl=0`` disables the cache.
+    """
+
+    def __init__(self, public_key: str, cache_ttl: float = 300, max_entries=10000):
+        self.key = jwk.construct(public_key, "RS256")
+        self.cache_ttl = cache_ttl
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[bytes, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def verify(self, token: str) -> Optional[dict]:
+        digest = hashlib.sha256(token.encode()).digest()
+        now = time.time()
+
+        entry = self.entries.get(digest)
+        if entry is not None:
+            claims, expires = entry
+            if expires > now:
+                self.hits += 1
+                self.entries.move_to_end(digest)
+                return claims
+            del self.entries[digest]
+
+        self.misses += 1
+
+        try:
+            body = jwt.decode(token, self.key, algorithms=["RS256"])
+        except JWTError as e:
+            logger.error(f"JWT verification failed: {e}")
+            return None
+
+        sub = body.get("sub")
+        if not sub:
+            raise HTTPException(status_code=401, detail="Invalid token")
+
+        claims = {"sub": sub, "admin": body.get("admin", False)}
+
+        if self.cache_ttl > 0:
+            expires = now + self.cache_ttl
+            if isinstance(body.get("exp"), (int, float)):
+                expires = min(expires, body["exp"])
+
+            self.entries[digest] = (claims, expires)
+            if len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+        return claims
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+        }
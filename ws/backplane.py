@@ -0,0 +1,252 @@
+import asyncio
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from typing import Awaitable, Callable, Collection, List, Optional, Tuple
+
+from replay import initial_seq
+
+logger = logging.getLogger(__name__)
+
+Deliver = Callable[[str, str, int], Awaitable[int]]
+LocalRooms = Callable[[], Collection[str]]
+
+# numbering and publishing in one script, so every subscriber sees a room's
+# messages in sequence order even when several nodes publish at once;
+# %d because Lua would print large numbers in exponent notation
+PUBLISH_SCRIPT = """
+redis.call("SET", KEYS[1], ARGV[1], "NX", "EX", ARGV[2])
+local seq = redis.call("INCR", KEYS[1])
+redis.call("PUBLISH", KEYS[2], string.format("%d", seq) .. "\\n" .. ARGV[3])
+return seq
+"""
+
+
+class Backplane:
+    """Carries broadcasts and room membership between WS server processes.
+
+    A broadcast posted to any node is numbered and published here, then
+    handed back to every node through ``deliver(message, room_id, seq)``,
+    which fans it out to the sockets that node holds. Sequence numbers are
+    assigned at publish time so every node agrees on them. ``local_rooms``
+    reports which rooms the node follows: those it has subscribers in, and
+    those whose subscribers left recently enough to be replayed to.
+    """
+
+    def bind(self, deliver: Deliver, local_rooms: LocalRooms):
+        """Called by the manager on construction, so a backplane that is
+        never started still knows its node's rooms."""
+        self.deliver = deliver
+        self.local_rooms = local_rooms
+
+    async def start(self, deliver: Deliver, local_rooms: LocalRooms):
+        self.bind(deliver, local_rooms)
+
+    async def stop(self):
+        pass
+
+    async def room_changed(self, room_id: str):
+        """Called after a room gains its first or loses its last local socket.
+
+        A room can stay in ``local_rooms`` after that, until its replay
+        history goes idle."""
+
+    async def publish(self, room_id: str, message: str) -> int:
+        """Number and broadcast ``message``, returning its sequence number."""
+        raise NotImplementedError
+
+    async def has_subscribers(self, room_id: str) -> bool:
+        raise NotImplementedError
+
+    async def rooms(self) -> List[str]:
+        raise NotImplementedError
+
+
+class LocalBackplane(Backplane):
+    """Single-process backplane; what the server did before there was one."""
+
+    def __init__(self, idle_seconds: float = 86400):
+        # counters of rooms without a broadcast for idle_seconds are
+        # forgotten, like the Redis keys; they restart from the clock
+        self.idle_seconds = idle_seconds
+        self.seqs: "OrderedDict[str, Tuple[int, float]]" = OrderedDict()
+
+    async def publish(self, room_id: str, message: str) -> int:
+        now = time.monotonic()
+        while self.seqs:
+            oldest, (_, last_used) = next(iter(self.seqs.items()))
+            if last_used >= now - self.idle_seconds:
+                break
+            del self.seqs[oldest]
+
+        seq, _ = self.seqs.pop(room_id, (None, None))
+        seq = (seq or initial_seq()) + 1
+        self.seqs[room_id] = (seq, now)
+
+        await self.deliver(message, room_id, seq)
+        return seq
+
+    async def has_subscribers(self, room_id: str) -> bool:
+        return room_id in self.local_rooms()
+
+    async def rooms(self) -> List[str]:
+        return list(self.local_rooms())
+
+
+class RedisBackplane(Backplane):
+    """Redis pub/sub backplane for running several workers or nodes.
+
+    Each room is a channel that a node subscribes to while it has sockets
+    in the room. Membership lives in sorted sets scored by expiry time and
+    refreshed by a heartbeat, so the rooms of a node that dies without
+    cleaning up age out after ``ttl`` seconds.
+    """
+
+    def __init__(self, url: str, prefix: str = "ws:", ttl: float = 30.0):
+        import redis.asyncio as redis
+
+        self.redis = redis.from_url(url, decode_responses=True)
+        self.prefix = prefix
+        self.ttl = ttl
+        self.node_id = uuid.uuid4().hex
+        self.pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+        self.publish_script = self.redis.register_script(PUBLISH_SCRIPT)
+        self.subscribed = set()
+        self.lock = asyncio.Lock()
+        self.has_channels = asyncio.Event()
+        self.tasks: List[asyncio.Task] = []
+
+    def channel(self, room_id: str) -> str:
+        return f"{self.prefix}room:{room_id}"
+
+    def members_key(self, room_id: str) -> str:
+        return f"{self.prefix}members:{room_id}"
+
+    def seq_key(self, room_id: str) -> str:
+        return f"{self.prefix}seq:{room_id}"
+
+    @property
+    def rooms_key(self) -> str:
+        return f"{self.prefix}rooms"
+
+    async def start(self, deliver: Deliver, local_rooms: LocalRooms):
+        await super().start(deliver, local_rooms)
+        await self.redis.ping()
+        self.tasks = [
+            asyncio.create_task(self._listen()),
+            asyncio.create_task(self._heartbeat()),
+        ]
+        logger.info("Redis backplane started node_id: %s", self.node_id)
+
+    async def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+
+        async with self.lock:
+            if self.subscribed:
+                pipe = self.redis.pipeline(transaction=False)
+                for room_id in self.subscribed:
+                    pipe.zrem(self.members_key(room_id), self.node_id)
+                await pipe.execute()
+                self.subscribed.clear()
+
+        await self.pubsub.aclose()
+        await self.redis.aclose()
+
+    async def room_changed(self, room_id: str):
+        # joins and leaves for one room can be scheduled out of order, so
+        # rather than trusting the event, reconcile with the current state
+        async with self.lock:
+            active = room_id in self.local_rooms()
+            if active == (room_id in self.subscribed):
+                return
+
+            if active:
+                await self.pubsub.subscribe(self.channel(room_id))
+                await self._advertise([room_id])
+                self.subscribed.add(room_id)
+                self.has_channels.set()
+            else:
+                await self._unsubscribe(room_id)
+
+    async def _unsubscribe(self, room_id: str):
+        self.subscribed.discard(room_id)
+        await self.redis.zrem(self.members_key(room_id), self.node_id)
+        await self.pubsub.unsubscribe(self.channel(room_id))
+
+    async def _advertise(self, room_ids):
+        expires = time.time() + self.ttl
+        pipe = self.redis.pipeline(transaction=False)
+        for room_id in room_ids:
+            pipe.zadd(self.members_key(room_id), {self.node_id: expires})
+            pipe.expire(self.members_key(room_id), int(self.ttl) + 1)
+            pipe.zadd(self.rooms_key, {room_id: expires}, gt=True)
+        pipe.zremrangebyscore(self.rooms_key, "-inf", time.time())
+        await pipe.execute()
+
+    async def _heartbeat(self):
+        while True:
+            await asyncio.sleep(self.ttl / 3)
+            try:
+                async with self.lock:
+                    # rooms kept for replay are let go once their history
+                    # goes idle, which no socket event reports
+                    local_rooms = self.local_rooms()
+                    for room_id in list(self.subscribed):
+                        if room_id not in local_rooms:
+                            await self._unsubscribe(room_id)
+                    if self.subscribed:
+                        await self._advertise(list(self.subscribed))
+            except Exception as e:
+                logger.error("Backplane heartbeat failed", extra={"error": e})
+
+    async def _listen(self):
+        while True:
+            await self.has_channels.wait()
+            try:
+                message = await self.pubsub.get_message(timeout=1.0)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Backplane listener failed", extra={"error": e})
+                await asyncio.sleep(1)
+                continue
+
+            if message is None or message.get("type") != "message":
+                continue
+
+            room_id = message["channel"][len(self.channel("")) :]
+            seq, _, data = message["data"].partition("\n")
+            try:
+                await self.deliver(data, room_id, int(seq))
+            except Exception as e:
+                logger.error(
+                    "Error delivering backplane message room_id: %s",
+                    room_id,
+                    extra={"error": e},
+                )
+
+    async def publish(self, room_id: str, message: str) -> int:
+        return await self.publish_script(
+            keys=[self.seq_key(room_id), self.channel(room_id)],
+            args=[initial_seq(), 86400, message],
+        )
+
+    async def has_subscribers(self, room_id: str) -> bool:
+        count = await self.redis.zcount(self.members_key(room_id), time.time(), "+inf")
+        return count > 0
+
+    async def rooms(self) -> List[str]:
+        return await self.redis.zrangebyscore(self.rooms_key, time.time(), "+inf")
+
+
+def create_backplane(kind: str, url: Optional[str], prefix: str, ttl: float):
+    if kind == "local":
+        return LocalBackplane()
+    if kind == "redis":
+        if not url:
+            raise ValueError("WS_REDIS_URL is required for the redis backplane")
+        return RedisBackplane(url, prefix=prefix, ttl=ttl)
+    raise ValueError(f"Unknown backplane: {kind}")
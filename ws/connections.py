@@ -0,0 +1,504 @@
+import asyncio
+import json
+import logging
+import time
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+from fastapi import WebSocket, status
+from fastapi.websockets import WebSocketState
+
+from backplane import Backplane, LocalBackplane
+from replay import ReplayBuffer
+
+logger = logging.getLogger(__name__)
+
+DROP_OLDEST = "drop-oldest"
+DROP_NEWEST = "drop-newest"
+DISCONNECT = "disconnect"
+
+SLOW_CONSUMER_POLICIES = (DROP_OLDEST, DROP_NEWEST, DISCONNECT)
+
+
+def text_frame(text: str) -> dict:
+    """The ASGI send event for a text message.
+
+    Built once per broadcast and shared by every recipient's queue instead
+    of having ``send_text`` rebuild it per socket. It stays a text frame
+    because overlays only handle text messages.
+    """
+    return {"type": "websocket.send", "text": text}
+
+
+def envelope_text(seq: int, message: str) -> str:
+    """Message wrapped with its sequence number, for replay-aware clients."""
+    return json.dumps({"seq": seq, "message": message})
+
+
+class Connection:
+    """A subscribed socket with its own outbound queue and writer task.
+
+    Broadcasts only enqueue; the writer drains the queue at whatever pace
+    the client reads, so a slow overlay backs up its own queue instead of
+    stalling the rest of the room. What happens once that queue is full is
+    decided by ``policy``.
+    """
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        room_id: str,
+        sub: str,
+        max_queue: int,
+        policy: str,
+        on_failure: Callable[["Connection", str], None],
+        envelope: bool = False,
+    ):
+        self.websocket = websocket
+        self.room_id = room_id
+        self.sub = sub
+        self.policy = policy
+        self.on_failure = on_failure
+        # replay-aware clients get {"seq", "message"} envelopes instead of
+        # the bare message
+        self.envelope = envelope
+        self.queue: asyncio.Queue = asyncio.Queue(max_queue)
+        self.writer: Optional[asyncio.Task] = None
+        self.dropped = 0
+        self.sent = 0
+        self.closed = False
+        # set while a send is in flight, for the manager's send watchdog
+        self.sending_since: Optional[float] = None
+        # last time the client sent anything, for the idle reaper
+        self.last_seen = time.monotonic()
+
+    @property
+    def client(self):
+        return self.websocket.client
+
+    def start(self):
+        self.writer = asyncio.create_task(self._write())
+
+    def touch(self):
+        self.last_seen = time.monotonic()
+
+    def dead_reason(self, idle_deadline: Optional[float]) -> Optional[str]:
+        """Why the reaper should remove this connection, if it should."""
+        if (
+            self.websocket.client_state == WebSocketState.DISCONNECTED
+            or self.websocket.application_state == WebSocketState.DISCONNECTED
+        ):
+            return "socket closed"
+        if self.writer is not None and self.writer.done():
+            return "writer stopped"
+        if idle_deadline is not None and self.last_seen < idle_deadline:
+            return "idle timeout"
+        return None
+
+    def enqueue(self, frame: dict) -> bool:
+        if self.closed:
+            return False
+
+        if self.queue.full():
+            if self.policy == DISCONNECT:
+                self.on_failure(self, "send queue full")
+                return False
+
+            self._drop()
+
+            if self.policy == DROP_NEWEST:
+                return False
+
+            self.queue.get_nowait()
+            self.queue.task_done()
+
+        self.queue.put_nowait(frame)
+        return True
+
+    def _drop(self):
+        if not self.dropped:
+            logger.warning(
+                "Slow consumer, dropping messages (%s) room_id: %s, client_host: %s",
+                self.policy,
+                self.room_id,
+                self.client.host,
+            )
+        self.dropped += 1
+
+    async def _write(self):
+        while True:
+            frame = await self.queue.get()
+            self.sending_since = time.monotonic()
+            try:
+                await self.websocket.send(frame)
+            except Exception as e:
+                logger.error(
+                    "Error broadcasting to client room_id: %s, client_host: %s",
+                    self.room_id,
+                    self.client.host,
+                    extra={"error": e},
+                )
+                self.on_failure(self, "send failed")
+                return
+            finally:
+                self.sending_since = None
+                self.queue.task_done()
+            self.sent += 1
+
+    def stop(self):
+        self.closed = True
+        if self.writer is not None and self.writer is not asyncio.current_task():
+            self.writer.cancel()
+
+
+class FollowedRooms:
+    """Rooms a node follows on the backplane: those it holds sockets in,
+    and those with recent replay history, whose clients may reconnect with
+    ``since`` and expect what was broadcast while they were away."""
+
+    def __init__(self, active_rooms: Dict[str, dict], replay: ReplayBuffer):
+        self.active_rooms = active_rooms
+        self.replay = replay
+
+    def __contains__(self, room_id) -> bool:
+        return room_id in self.active_rooms or self.replay.is_recent(room_id)
+
+    def __iter__(self) -> Iterator[str]:
+        yield from self.active_rooms
+        for room_id in self.replay.recent_rooms():
+            if room_id not in self.active_rooms:
+                yield room_id
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+
+class ConnectionManager:
+    def __init__(
+        self,
+        max_queue: int = 256,
+        policy: str = DROP_OLDEST,
+        send_timeout: Optional[float] = 10.0,
+        backplane: Optional[Backplane] = None,
+        replay: Optional[ReplayBuffer] = None,
+        idle_timeout: Optional[float] = None,
+        reap_interval: float = 15.0,
+    ):
+        if policy not in SLOW_CONSUMER_POLICIES:
+            raise ValueError(f"Unknown slow consumer policy: {policy}")
+
+        self.max_queue = max_queue
+        self.policy = policy
+        self.send_timeout = send_timeout
+        self.backplane = backplane or LocalBackplane()
+        self.replay = replay or ReplayBuffer()
+        self.background_tasks: Set[asyncio.Task] = set()
+        self.watchdog: Optional[asyncio.Task] = None
+        # sockets the client stopped talking on are only noticed by the
+        # reaper; protocol pings are left to uvicorn
+        self.idle_timeout = idle_timeout
+        self.reap_interval = reap_interval
+        self.reaper: Optional[asyncio.Task] = None
+        self.reaped: Dict[str, int] = {}
+        self.active_rooms: Dict[str, Dict[WebSocket, Connection]] = {}
+        self.followed = FollowedRooms(self.active_rooms, self.replay)
+        self.backplane.bind(self.broadcast_to_room, self.followed_rooms)
+        # dropped/evicted counts of connections that already left, so room
+        # metrics survive churn for as long as the room has subscribers
+        self.room_counters: Dict[str, Dict[str, int]] = {}
+        self.total_dropped = 0
+        self.total_evicted = 0
+
+    async def start(self):
+        await self.backplane.start(self.broadcast_to_room, self.followed_rooms)
+        if self.send_timeout:
+            self.watchdog = asyncio.create_task(self._watch_sends())
+        if self.reap_interval:
+            self.reaper = asyncio.create_task(self._reap())
+
+    async def stop(self):
+        if self.watchdog is not None:
+            self.watchdog.cancel()
+        if self.reaper is not None:
+            self.reaper.cancel()
+        await self.backplane.stop()
+
+    def followed_rooms(self) -> "FollowedRooms":
+        return self.followed
+
+    async def _watch_sends(self):
+        # one sweep instead of a wait_for per send, which costs a task for
+        # every message to every socket
+        while True:
+            await asyncio.sleep(self.send_timeout / 4)
+            deadline = time.monotonic() - self.send_timeout
+            for room in list(self.active_rooms.values()):
+                for connection in list(room.values()):
+                    started = connection.sending_since
+                    if started is not None and started < deadline:
+                        self.evict(connection, "send timed out")
+
+    async def _reap(self):
+        while True:
+            await asyncio.sleep(self.reap_interval)
+            self.reap()
+
+    def reap(self) -> int:
+        """Remove connections that are closed, lost their writer or have
+        been silent for longer than ``idle_timeout``."""
+        idle_deadline = None
+        if self.idle_timeout:
+            idle_deadline = time.monotonic() - self.idle_timeout
+
+        reaped = 0
+        for room in list(self.active_rooms.values()):
+            for connection in list(room.values()):
+                reason = connection.dead_reason(idle_deadline)
+                if reason is None:
+                    continue
+                self.evict(connection, reason)
+                self.reaped[reason] = self.reaped.get(reason, 0) + 1
+                reaped += 1
+        return reaped
+
+    def touch(self, websocket: WebSocket, room_id: str):
+        connection = self.active_rooms.get(room_id, {}).get(websocket)
+        if connection is not None:
+            connection.touch()
+
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self.background_tasks.add(task)
+        task.add_done_callback(self.background_tasks.discard)
+
+    async def connect(
+        self,
+        websocket: WebSocket,
+        room_id: str,
+        sub: str,
+        since: Optional[int] = None,
+        envelope: bool = False,
+    ):
+
+        await websocket.accept()
+
+        connection = Connection(
+            websocket,
+            room_id,
+            sub,
+            self.max_queue,
+            self.policy,
+            self.evict,
+            envelope=envelope or since is not None,
+        )
+        connection.start()
+
+        new_room = room_id not in self.active_rooms
+        if new_room:
+            self.active_rooms[room_id] = {}
+            self.room_counters[room_id] = {"dropped": 0, "evicted": 0}
+        self.active_rooms[room_id][websocket] = connection
+
+        # queued before any await, so nothing broadcast from here on can
+        # overtake or duplicate the replayed messages
+        if since is not None:
+            for frame in self.replay.since(room_id, since):
+                connection.enqueue(frame)
+
+        if new_room:
+            await self.backplane.room_changed(room_id)
+
+        logger.info(
+            "Client connected to room room_id: %s, client_host: %s, sub: %s",
+            room_id,
+            websocket.client.host,
+            sub,
+        )
+
+    def _remove(self, websocket: WebSocket, room_id: str) -> Optional[Connection]:
+        room = self.active_rooms.get(room_id)
+        if room is None:
+            return None
+
+        connection = room.pop(websocket, None)
+        if connection is not None:
+            connection.stop()
+            self.room_counters[room_id]["dropped"] += connection.dropped
+            self.total_dropped += connection.dropped
+            if connection.envelope:
+                # it may reconnect with ?since=, keep the room's history
+                self.replay.touch(room_id)
+
+        if not room:
+            del self.active_rooms[room_id]
+            del self.room_counters[room_id]
+            self._spawn(self.backplane.room_changed(room_id))
+
+        return connection
+
+    def disconnect(self, websocket: WebSocket, room_id: str):
+        # already gone if it was evicted or reaped
+        if self._remove(websocket, room_id) is None:
+            return
+        logger.info(
+            "Client disconnected from room room_id: %s, client_host: %s",
+            room_id,
+            websocket.client.host,
+        )
+
+    def evict(self, connection: Connection, reason: str):
+        if connection.closed:
+            return
+
+        if self._remove(connection.websocket, connection.room_id) is None:
+            return
+
+        if connection.room_id in self.room_counters:
+            self.room_counters[connection.room_id]["evicted"] += 1
+        self.total_evicted += 1
+
+        logger.warning(
+            "Evicting client room_id: %s, client_host: %s, reason: %s",
+            connection.room_id,
+            connection.client.host,
+            reason,
+        )
+
+        self._spawn(self._close(connection.websocket, reason))
+
+    async def _close(self, websocket: WebSocket, reason: str):
+        try:
+            await asyncio.wait_for(
+                websocket.close(code=status.WS_1013_TRY_AGAIN_LATER, reason=reason),
+                self.send_timeout,
+            )
+        except Exception:
+            # the socket is usually already broken, which is why it is evicted
+            pass
+
+    async def publish(self, room_id: str, message: str) -> int:
+        """Broadcast to the room's subscribers on every node."""
+        return await self.backplane.publish(room_id, message)
+
+    async def publish_batch(
+        self, items: List[Tuple[List[str], str]]
+    ) -> List[Dict[str, str]]:
+        """Publish ``(room_ids, message)`` items, returning each item's
+        status per room.
+
+        Rooms are published to concurrently; messages for the same room go
+        out one after another in item order.
+        """
+        by_room: Dict[str, List[Tuple[int, str]]] = {}
+        for index, (room_ids, message) in enumerate(items):
+            for room_id in room_ids:
+                by_room.setdefault(room_id, []).append((index, message))
+
+        results: List[Dict[str, str]] = [{} for _ in items]
+
+        async def publish_room(room_id: str, pending: List[Tuple[int, str]]):
+            try:
+                if not await self.has_room(room_id):
+                    for index, _ in pending:
+                        results[index][room_id] = "not_found"
+                    return
+
+                for index, message in pending:
+                    await self.publish(room_id, message)
+                    results[index][room_id] = "success"
+            except Exception as e:
+                logger.error(
+                    "Error in batch broadcast room_id: %s",
+                    room_id,
+                    extra={"error": e},
+                )
+                for index, _ in pending:
+                    results[index].setdefault(room_id, "error")
+
+        await asyncio.gather(
+            *(publish_room(room_id, pending) for room_id, pending in by_room.items())
+        )
+
+        return results
+
+    async def has_room(self, room_id: str) -> bool:
+        if room_id in self.followed:
+            return True
+        return await self.backplane.has_subscribers(room_id)
+
+    async def rooms(self):
+        return await self.backplane.rooms()
+
+    async def broadcast_to_room(
+        self,
+        message: str,
+        room_id: str,
+        seq: Optional[int] = None,
+        exclude_websocket: Optional[WebSocket] = None,
+    ) -> int:
+        envelope = None
+        if seq is not None:
+            envelope = self._record(room_id, seq, message)
+
+        room = self.active_rooms.get(room_id)
+        if not room:
+            return 0
+
+        frame = text_frame(message)
+        envelope = envelope or frame
+
+        delivered = 0
+        for websocket, connection in list(room.items()):
+            if websocket != exclude_websocket and connection.enqueue(
+                envelope if connection.envelope else frame
+            ):
+                delivered += 1
+        return delivered
+
+    def _record(self, room_id: str, seq: int, message: str) -> dict:
+        text = envelope_text(seq, message)
+        envelope = text_frame(text)
+        self.replay.append(room_id, seq, envelope, len(text))
+        return envelope
+
+    def room_metrics(self, room_id: str) -> Optional[dict]:
+        room = self.active_rooms.get(room_id)
+        if room is None:
+            return None
+
+        depths = [connection.queue.qsize() for connection in room.values()]
+        counters = self.room_counters[room_id]
+
+        now = time.monotonic()
+
+        return {
+            "connections": len(room),
+            "max_idle_seconds": max(
+                (now - connection.last_seen for connection in room.values()),
+                default=0.0,
+            ),
+            "queue_depth": sum(depths),
+            "max_queue_depth": max(depths, default=0),
+            "dropped": counters["dropped"]
+            + sum(connection.dropped for connection in room.values()),
+            "evicted": counters["evicted"],
+        }
+
+    def metrics(self) -> dict:
+        rooms = {room_id: self.room_metrics(room_id) for room_id in self.active_rooms}
+
+        return {
+            "policy": self.policy,
+            "max_queue": self.max_queue,
+            "connections": sum(room["connections"] for room in rooms.values()),
+            "dropped": self.total_dropped
+            + sum(
+                connection.dropped
+                for room in self.active_rooms.values()
+                for connection in room.values()
+            ),
+            "evicted": self.total_evicted,
+            "idle_timeout": self.idle_timeout,
+            "reaped": dict(self.reaped),
+            "queued_messages": sum(room["queue_depth"] for room in rooms.values()),
+            "rooms": rooms,
+        }
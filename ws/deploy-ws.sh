@@ -45,7 +45,7 @@ then
   exit 1
 fi
 
-scp $SCP_OPTIONS -r $BINARY_NAME requirements.txt $REMOTE_USER@$REMOTE_HOST:$REMOTE_DIR/
+scp $SCP_OPTIONS -r *.py requirements.txt $REMOTE_USER@$REMOTE_HOST:$REMOTE_DIR/
 
 # SSH into remote server and perform deployment
 echo "Deploying on remote server..."
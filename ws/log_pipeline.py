@@ -0,0 +1,182 @@
+import logging
+import queue
+import random
+import threading
+import time
+from logging.handlers import QueueHandler
+from typing import List, Sequence
+
+import watchtower
+
+
+def sampled(rate: float) -> bool:
+    """Whether to log one occurrence of a message logged at ``rate``."""
+    return rate >= 1 or random.random() < rate
+
+
+class BoundedQueueHandler(QueueHandler):
+    """Hands records to a bounded queue and never blocks the caller.
+
+    When the listener falls behind the queue fills up and further records
+    are dropped and counted instead of stalling the event loop.
+    """
+
+    def __init__(self, maxsize: int = 10000):
+        super().__init__(queue.Queue(maxsize))
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class BatchingCloudWatchHandler(watchtower.CloudWatchLogHandler):
+    """Sends a whole batch of records in one PutLogEvents call per stream."""
+
+    def emit_batch(self, records: Sequence[logging.LogRecord]):
+        streams = {}
+        for record in records:
+            if self.creating_log_stream or record.getMessage() == "":
+                continue
+            try:
+                message = dict(
+                    timestamp=int(record.created * 1000), message=self.format(record)
+                )
+                limit = self.max_message_size - self.EXTRA_MSG_PAYLOAD_SIZE
+                if self._size(message) > limit:
+                    message = self._truncate(message, limit)
+                streams.setdefault(self._get_stream_name(record), []).append(message)
+            except Exception:
+                self.handleError(record)
+
+        for stream_name, messages in streams.items():
+            self.sequence_tokens.setdefault(stream_name, None)
+            chunk, size = [], 0
+            for message in messages:
+                message_size = self._size(message)
+                if chunk and (
+                    size + message_size > self.max_batch_size
+                    or len(chunk) >= self.max_batch_count
+                ):
+                    self._submit(chunk, stream_name)
+                    chunk, size = [], 0
+                chunk.append(message)
+                size += message_size
+            self._submit(chunk, stream_name)
+
+    def _submit(self, chunk, stream_name):
+        try:
+            self._submit_batch(chunk, stream_name)
+        except Exception:
+            logging.getLogger(__name__).debug("CloudWatch batch failed", exc_info=True)
+
+
+class BatchingListener:
+    """Drains a handler's queue on a background thread.
+
+    Records are collected for up to ``flush_interval`` seconds or
+    ``batch_size`` records and then passed on together, so handlers that
+    talk to the network make one call per batch rather than per record.
+    """
+
+    _STOP = object()
+
+    def __init__(
+        self,
+        queue_handler: BoundedQueueHandler,
+        handlers: List[logging.Handler],
+        batch_size: int = 500,
+        flush_interval: float = 1.0,
+    ):
+        self.queue_handler = queue_handler
+        self.queue = queue_handler.queue
+        self.handlers = handlers
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.thread = None
+        self.batches = 0
+        self.reported_drops = 0
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        if self.thread is None:
+            return
+        self.queue.put(self._STOP)
+        self.thread.join(timeout=5)
+        self.thread = None
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            record = self.queue.get()
+            if record is self._STOP:
+                break
+
+            batch = [record]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    record = self.queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if record is self._STOP:
+                    stopping = True
+                    break
+                batch.append(record)
+
+            self._report_drops(batch)
+            self._emit(batch)
+
+    def _report_drops(self, batch: List[logging.LogRecord]):
+        dropped = self.queue_handler.dropped
+        if dropped > self.reported_drops:
+            batch.append(
+                logging.LogRecord(
+                    __name__,
+                    logging.WARNING,
+                    __file__,
+                    0,
+                    "Log queue full, dropped %d records",
+                    (dropped - self.reported_drops,),
+                    None,
+                )
+            )
+            self.reported_drops = dropped
+
+    def _emit(self, batch: List[logging.LogRecord]):
+        self.batches += 1
+        for handler in self.handlers:
+            records = [
+                record
+                for record in batch
+                if record.levelno >= handler.level and handler.filter(record)
+            ]
+            if not records:
+                continue
+            try:
+                if hasattr(handler, "emit_batch"):
+                    handler.emit_batch(records)
+                else:
+                    for record in records:
+                        handler.handle(record)
+                    handler.flush()
+            except Exception:
+                # a broken handler must not kill the thread every log goes
+                # through
+                pass
+
+    def stats(self) -> dict:
+        return {
+            "queued": self.queue.qsize(),
+            "max_queue": self.queue.maxsize,
+            "dropped": self.queue_handler.dropped,
+            "batches": self.batches,
+        }
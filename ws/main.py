@@ -1,10 +1,12 @@
+import atexit
+import json
 import logging
 import os
-from typing import Dict, Optional, Set
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional, Tuple
 
 import boto3
 import uvicorn
-import watchtower
 from dotenv import load_dotenv
 from fastapi import (
     Depends,
@@ -14,14 +16,31 @@ from fastapi import (
     Security,
     WebSocket,
     WebSocketDisconnect,
+    status,
 )
 from fastapi.responses import JSONResponse
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
-from jose import JWTError, jwt
+
+from auth import TokenVerifier
+from backplane import create_backplane
+from connections import ConnectionManager
+from log_pipeline import (
+    BatchingCloudWatchHandler,
+    BatchingListener,
+    BoundedQueueHandler,
+    sampled,
+)
+from replay import ReplayBuffer
 
 load_dotenv()
 
-cloudwatch_handler = watchtower.CloudWatchLogHandler(
+LOG_QUEUE_SIZE = int(os.getenv("WS_LOG_QUEUE_SIZE", 10000))
+LOG_BATCH_SIZE = int(os.getenv("WS_LOG_BATCH_SIZE", 500))
+LOG_FLUSH_INTERVAL = float(os.getenv("WS_LOG_FLUSH_INTERVAL", 1))
+# fraction of client messages logged as they are received
+CLIENT_MESSAGE_LOG_RATE = float(os.getenv("WS_CLIENT_MESSAGE_LOG_RATE", 1))
+
+cloudwatch_handler = BatchingCloudWatchHandler(
     boto3_client=boto3.client("logs", "us-west-2"),
     log_group="CheesyBotWSServer",
     use_queues=False,
@@ -38,8 +57,18 @@ root_logger.setLevel(logging.INFO)
 for handler in root_logger.handlers[:]:
     root_logger.removeHandler(handler)
 
-root_logger.addHandler(cloudwatch_handler)
-root_logger.addHandler(console_handler)
+# handlers run on the listener's thread; the event loop only ever enqueues
+queue_handler = BoundedQueueHandler(LOG_QUEUE_SIZE)
+log_listener = BatchingListener(
+    queue_handler,
+    [cloudwatch_handler, console_handler],
+    batch_size=LOG_BATCH_SIZE,
+    flush_interval=LOG_FLUSH_INTERVAL,
+)
+log_listener.start()
+atexit.register(log_listener.stop)
+
+root_logger.addHandler(queue_handler)
 
 logger = logging.getLogger(__name__)
 
@@ -47,88 +76,99 @@ uvicorn_access_logger = logging.getLogger("uvicorn.access")
 uvicorn_access_logger.propagate = False
 for handler in uvicorn_access_logger.handlers[:]:
     uvicorn_access_logger.removeHandler(handler)
-uvicorn_access_logger.addHandler(console_handler)
-
-app = FastAPI()
-security = HTTPBearer()
+uvicorn_access_logger.addHandler(queue_handler)
+# access logs only ever went to the console
+cloudwatch_handler.addFilter(lambda record: record.name != "uvicorn.access")
 
 
-PUBLIC_KEY = os.getenv("JWT_PUBLIC_KEY")
-if not PUBLIC_KEY:
-    raise ValueError("JWT_PUBLIC_KEY environment variable is required")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await manager.start()
+    yield
+    await manager.stop()
 
 
-class ConnectionManager:
-    def __init__(self):
-        self.active_rooms: Dict[str, Set[WebSocket]] = {}
+app = FastAPI(lifespan=lifespan)
+# checked by authorize_bearer, which falls back to ?token= without a header
+security = HTTPBearer(auto_error=False)
 
-    async def connect(self, websocket: WebSocket, room_id: str, sub: str):
 
-        await websocket.accept()
-        if room_id not in self.active_rooms:
-            self.active_rooms[room_id] = set()
-        self.active_rooms[room_id].add(websocket)
-        logger.info(
-            "Client connected to room room_id: %s, client_host: %s, sub: %s",
-            room_id,
-            websocket.client.host,
-            sub,
-        )
+PUBLIC_KEY = os.getenv("JWT_PUBLIC_KEY")
+if not PUBLIC_KEY:
+    raise ValueError("JWT_PUBLIC_KEY environment variable is required")
 
-    def disconnect(self, websocket: WebSocket, room_id: str):
-        if room_id in self.active_rooms:
-            self.active_rooms[room_id].discard(websocket)
-            if not self.active_rooms[room_id]:
-                del self.active_rooms[room_id]
-        logger.info(
-            "Client disconnected from room room_id: %s, client_host: %s",
-            room_id,
-            websocket.client.host,
-        )
+TOKEN_CACHE_TTL = float(os.getenv("WS_TOKEN_CACHE_TTL", 300))
+TOKEN_CACHE_MAX_ENTRIES = int(os.getenv("WS_TOKEN_CACHE_MAX_ENTRIES", 10000))
 
-    async def broadcast_to_room(
-        self, message: str, room_id: str, exclude_websocket: Optional[WebSocket] = None
-    ):
-        if room_id in self.active_rooms:
-            for connection in self.active_rooms[room_id]:
-                if connection != exclude_websocket:
-                    try:
-                        await connection.send_text(message)
-                    except Exception as e:
-                        logger.error(
-                            "Error broadcasting to client room_id: %s, client_host: %s",
-                            room_id,
-                            connection.client.host,
-                            extra={"error": e},
-                        )
+verifier = TokenVerifier(
+    PUBLIC_KEY, cache_ttl=TOKEN_CACHE_TTL, max_entries=TOKEN_CACHE_MAX_ENTRIES
+)
 
 
-manager = ConnectionManager()
+SEND_QUEUE_SIZE = int(os.getenv("WS_SEND_QUEUE_SIZE", 256))
+SLOW_CONSUMER_POLICY = os.getenv("WS_SLOW_CONSUMER_POLICY", "drop-oldest")
+SEND_TIMEOUT = float(os.getenv("WS_SEND_TIMEOUT", 10))
+
+BACKPLANE = os.getenv("WS_BACKPLANE", "local")
+REDIS_URL = os.getenv("WS_REDIS_URL")
+BACKPLANE_PREFIX = os.getenv("WS_BACKPLANE_PREFIX", "ws:")
+BACKPLANE_TTL = float(os.getenv("WS_BACKPLANE_TTL", 30))
+
+BATCH_MAX_ITEMS = int(os.getenv("WS_BATCH_MAX_ITEMS", 500))
+
+REPLAY_ROOM_MESSAGES = int(os.getenv("WS_REPLAY_ROOM_MESSAGES", 50))
+REPLAY_MAX_BYTES = int(os.getenv("WS_REPLAY_MAX_BYTES", 16 * 1024 * 1024))
+REPLAY_IDLE_SECONDS = float(os.getenv("WS_REPLAY_IDLE_SECONDS", 300))
+
+# protocol-level pings are sent by uvicorn; a peer that misses a pong is
+# disconnected, which ends its receive loop like any other close
+PING_INTERVAL = float(os.getenv("WS_PING_INTERVAL", 20)) or None
+PING_TIMEOUT = float(os.getenv("WS_PING_TIMEOUT", 20)) or None
+# 0 disables; enable once every overlay sends heartbeats
+IDLE_TIMEOUT = float(os.getenv("WS_IDLE_TIMEOUT", 0)) or None
+REAP_INTERVAL = float(os.getenv("WS_REAP_INTERVAL", 15))
+
+# text a client sends only to show it is alive
+HEARTBEAT = "ping"
+
+manager = ConnectionManager(
+    max_queue=SEND_QUEUE_SIZE,
+    policy=SLOW_CONSUMER_POLICY,
+    send_timeout=SEND_TIMEOUT,
+    backplane=create_backplane(BACKPLANE, REDIS_URL, BACKPLANE_PREFIX, BACKPLANE_TTL),
+    replay=ReplayBuffer(
+        room_messages=REPLAY_ROOM_MESSAGES,
+        max_bytes=REPLAY_MAX_BYTES,
+        idle_seconds=REPLAY_IDLE_SECONDS,
+    ),
+    idle_timeout=IDLE_TIMEOUT,
+    reap_interval=REAP_INTERVAL,
+)
 
 
 def verify_token(token: str) -> dict:
-    try:
-        body = jwt.decode(token, PUBLIC_KEY, algorithms=["RS256"])
+    return verifier.verify(token) or False
 
-        sub = body.get("sub")
-        if not sub:
-            raise HTTPException(status_code=401, detail="Invalid token")
 
-        admin = body.get("admin", False)
+def authorize(token: str):
+    body = verify_token(token)
+    if not body:
+        raise HTTPException(status_code=401, detail="Invalid token")
 
-        return {"sub": sub, "admin": admin}
+    return body
 
-    except JWTError as e:
-        logger.error(f"JWT verification failed: {e}")
-        return False
 
+def authorize_bearer(
+    credentials: Optional[HTTPAuthorizationCredentials] = Security(security),
+    token: Optional[str] = None,
+):
+    if credentials is not None:
+        token = credentials.credentials
 
-def authorize(token: str):
-    try:
-        return verify_token(token)
-    except JWTError as e:
-        logger.error(f"JWT verification failed: {e}")
-        raise HTTPException(status_code=401, detail="Invalid token")
+    if not token:
+        raise HTTPException(status_code=401, detail="No token provided")
+
+    return authorize(token)
 
 
 def authorize_websocket(websocket: WebSocket):
@@ -170,10 +210,10 @@ async def broadcast_message(
                 status_code=400, detail="room_id and message are required"
             )
 
-        if room_id not in manager.active_rooms:
+        if not await manager.has_room(room_id):
             raise HTTPException(status_code=404, detail="Room not found")
 
-        await manager.broadcast_to_room(message=message, room_id=room_id)
+        await manager.publish(room_id, message)
 
         return JSONResponse(
             status_code=200,
@@ -183,6 +223,8 @@ async def broadcast_message(
             },
         )
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(
             "Error in broadcast endpoint",
@@ -191,6 +233,159 @@ async def broadcast_message(
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
+def parse_batch_item(item) -> Tuple[List[str], str]:
+    if not isinstance(item, dict):
+        raise ValueError("item must be an object")
+
+    message = item.get("message")
+    room_ids = item.get("room_ids")
+    if room_ids is None and item.get("room_id"):
+        room_ids = [item.get("room_id")]
+
+    if not message or not isinstance(message, str):
+        raise ValueError("message is required")
+
+    if (
+        not room_ids
+        or not isinstance(room_ids, list)
+        or not all(room_id and isinstance(room_id, str) for room_id in room_ids)
+    ):
+        raise ValueError("room_id or room_ids is required")
+
+    return list(dict.fromkeys(room_ids)), message
+
+
+def batch_item_status(rooms: Dict[str, str]) -> str:
+    statuses = set(rooms.values())
+    if statuses == {"success"}:
+        return "success"
+    if statuses == {"not_found"}:
+        return "not_found"
+    if "success" in statuses:
+        return "partial"
+    return "error"
+
+
+@app.post("/broadcast/batch")
+async def broadcast_batch(
+    request: Request, credentials: dict = Depends(authorize_bearer)
+):
+    try:
+        body = await request.json()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid JSON body")
+
+    items = body.get("items") if isinstance(body, dict) else body
+
+    if not isinstance(items, list) or not items:
+        raise HTTPException(status_code=400, detail="items must be a non-empty list")
+
+    if len(items) > BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=400, detail=f"At most {BATCH_MAX_ITEMS} items per batch"
+        )
+
+    try:
+        results = await publish_items(items)
+    except Exception as e:
+        logger.error(
+            "Error in batch broadcast endpoint",
+            extra={"error": e},
+        )
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+    return JSONResponse(status_code=200, content={"results": results})
+
+
+async def publish_items(items: list) -> List[dict]:
+    results: List[Optional[dict]] = [None] * len(items)
+    valid = []
+    for index, item in enumerate(items):
+        try:
+            valid.append((index, parse_batch_item(item)))
+        except ValueError as e:
+            results[index] = {"status": "invalid", "detail": str(e)}
+
+    published = await manager.publish_batch([parsed for _, parsed in valid])
+
+    for (index, _), rooms in zip(valid, published):
+        results[index] = {"status": batch_item_status(rooms), "rooms": rooms}
+
+    return results
+
+
+@app.websocket("/producer")
+async def producer_endpoint(websocket: WebSocket):
+    """Long-lived channel for producers, authenticated once per connection.
+
+    Each text frame is one item (``{"room_id" | "room_ids", "message"}``)
+    or ``{"items": [...]}``. Frames with an ``id`` get an ack carrying the
+    same per-item results as /broadcast/batch; frames without one are
+    fire-and-forget.
+    """
+    token = websocket.query_params.get("token")
+    header = websocket.headers.get("Authorization", "")
+    if not token and header.startswith("Bearer "):
+        token = header.split(" ")[1]
+
+    credentials = verify_token(token) if token else False
+    if not credentials:
+        await websocket.close(
+            code=status.WS_1008_POLICY_VIOLATION, reason="Invalid token"
+        )
+        return
+
+    await websocket.accept()
+    logger.info(
+        "Producer connected client_host: %s, sub: %s",
+        websocket.client.host,
+        credentials.get("sub"),
+    )
+
+    try:
+        while True:
+            await handle_producer_frame(websocket, await websocket.receive_text())
+    except WebSocketDisconnect:
+        logger.info(
+            "Producer disconnected client_host: %s, sub: %s",
+            websocket.client.host,
+            credentials.get("sub"),
+        )
+
+
+async def handle_producer_frame(websocket: WebSocket, text: str):
+    try:
+        frame = json.loads(text)
+    except ValueError:
+        await websocket.send_json({"error": "Invalid JSON"})
+        return
+
+    if not isinstance(frame, dict):
+        await websocket.send_json({"error": "Frame must be an object"})
+        return
+
+    frame_id = frame.get("id")
+    items = frame.get("items", [frame])
+
+    if not isinstance(items, list) or not items or len(items) > BATCH_MAX_ITEMS:
+        await websocket.send_json(
+            {
+                "id": frame_id,
+                "error": f"items must be a list of 1 to {BATCH_MAX_ITEMS} items",
+            }
+        )
+        return
+
+    try:
+        results = await publish_items(items)
+    except Exception as e:
+        logger.error("Error in producer channel", extra={"error": e})
+        results = [{"status": "error"} for _ in items]
+
+    if frame_id is not None:
+        await websocket.send_json({"id": frame_id, "results": results})
+
+
 @app.websocket("/ws/{room_id}")
 async def websocket_endpoint(
     websocket: WebSocket,
@@ -205,11 +400,33 @@ async def websocket_endpoint(
         )
         return
 
+    since = websocket.query_params.get("since")
+    if since is not None:
+        try:
+            since = int(since)
+        except ValueError:
+            await websocket.close(
+                code=status.WS_1008_POLICY_VIOLATION,
+                reason="since must be a sequence number",
+            )
+            return
+
     credentials = authorize(token)
-    await manager.connect(websocket, room_id, credentials.get("sub"))
+    await manager.connect(
+        websocket,
+        room_id,
+        credentials.get("sub"),
+        since=since,
+        envelope=websocket.query_params.get("seq") == "1",
+    )
     try:
         while True:
             text = await websocket.receive_text()
+            manager.touch(websocket, room_id)
+            if text == HEARTBEAT:
+                continue
+            if not sampled(CLIENT_MESSAGE_LOG_RATE):
+                continue
             logger.info(
                 "Received message from client room_id: %s, client_host: %s, sub: %s, message: %s",
                 room_id,
@@ -217,13 +434,33 @@ async def websocket_endpoint(
                 credentials.get("sub"),
                 text,
             )
-    except WebSocketDisconnect:
+    except (WebSocketDisconnect, RuntimeError):
+        # RuntimeError once the reaper has already closed the socket
         manager.disconnect(websocket, room_id)
 
 
 @app.get("/admin/rooms")
 async def get_rooms():
-    return {"rooms": list(manager.active_rooms.keys())}
+    return {"rooms": await manager.rooms()}
+
+
+@app.get("/admin/metrics")
+async def get_metrics():
+    return {
+        **manager.metrics(),
+        "auth": verifier.stats(),
+        "replay": manager.replay.stats(),
+        "logging": log_listener.stats(),
+    }
+
+
+@app.get("/admin/rooms/{room_id}/metrics")
+async def get_room_metrics(room_id: str):
+    metrics = manager.room_metrics(room_id)
+    if metrics is None:
+        raise HTTPException(status_code=404, detail="Room not found")
+
+    return {"room_id": room_id, **metrics}
 
 
 @app.get("/admin/rooms/{room_id}/connections")
@@ -248,6 +485,8 @@ if __name__ == "__main__":
             ssl_keyfile=key,
             ssl_certfile=cert,
             log_config=None,
+            ws_ping_interval=PING_INTERVAL,
+            ws_ping_timeout=PING_TIMEOUT,
         )
 
     else:
@@ -257,4 +496,6 @@ if __name__ == "__main__":
             port=8000,
             reload=True,
             log_config=None,
+            ws_ping_interval=PING_INTERVAL,
+            ws_ping_timeout=PING_TIMEOUT,
         )
@@ -0,0 +1,109 @@
+import time
+from collections import OrderedDict, deque
+from typing import Deque, Iterator, List, Tuple
+
+
+def initial_seq() -> int:
+    # counters start from the clock so that after a restart, or once an idle
+    # room's counter is forgotten, new numbers are still above anything a
+    # client saw before; microseconds stay within a JS safe integer
+    return time.time_ns() // 1000
+
+
+class ReplayBuffer:
+    """Recent broadcasts per room, for overlays that reconnect with ``since``.
+
+    Each room keeps at most ``room_messages`` entries. All rooms together
+    stay under ``max_bytes``, trimmed from the least recently active room
+    first, and rooms without a broadcast for ``idle_seconds`` are dropped.
+    """
+
+    def __init__(self, room_messages=50, max_bytes=16 * 1024 * 1024, idle_seconds=300):
+        self.room_messages = room_messages
+        self.max_bytes = max_bytes
+        self.idle_seconds = idle_seconds
+        # room_id -> (last activity, entries), least recently active first
+        self.rooms: "OrderedDict[str, Tuple[float, Deque[Tuple[int, dict, int]]]]" = (
+            OrderedDict()
+        )
+        self.bytes = 0
+        self.evicted_messages = 0
+        self.evicted_rooms = 0
+
+    def append(self, room_id: str, seq: int, frame: dict, size: int):
+        if self.room_messages <= 0:
+            return
+
+        now = time.monotonic()
+        self._evict_idle(now)
+
+        _, entries = self.rooms.pop(room_id, (None, deque()))
+        self.rooms[room_id] = (now, entries)
+
+        # since() relies on entries staying in sequence order
+        if entries and entries[-1][0] >= seq:
+            return
+
+        entries.append((seq, frame, size))
+        self.bytes += size
+
+        if len(entries) > self.room_messages:
+            self.bytes -= entries.popleft()[2]
+            self.evicted_messages += 1
+
+        while self.bytes > self.max_bytes and self.rooms:
+            oldest_room, (_, oldest) = next(iter(self.rooms.items()))
+            if oldest:
+                self.bytes -= oldest.popleft()[2]
+                self.evicted_messages += 1
+            if not oldest:
+                del self.rooms[oldest_room]
+                self.evicted_rooms += 1
+
+    def touch(self, room_id: str):
+        """Keep a room alive while its overlays are away, so broadcasts
+        sent before they reconnect are kept for them."""
+        if self.room_messages <= 0:
+            return
+
+        now = time.monotonic()
+        self._evict_idle(now)
+
+        _, entries = self.rooms.pop(room_id, (None, deque()))
+        self.rooms[room_id] = (now, entries)
+
+    def is_recent(self, room_id: str) -> bool:
+        entry = self.rooms.get(room_id)
+        return entry is not None and entry[0] >= time.monotonic() - self.idle_seconds
+
+    def recent_rooms(self) -> Iterator[str]:
+        deadline = time.monotonic() - self.idle_seconds
+        for room_id, (last_active, _) in reversed(self.rooms.items()):
+            if last_active < deadline:
+                break
+            yield room_id
+
+    def since(self, room_id: str, seq: int) -> List[dict]:
+        _, entries = self.rooms.get(room_id, (None, ()))
+        return [frame for entry_seq, frame, _ in entries if entry_seq > seq]
+
+    def _evict_idle(self, now: float):
+        deadline = now - self.idle_seconds
+        while self.rooms:
+            room_id, (last_active, entries) = next(iter(self.rooms.items()))
+            if last_active >= deadline:
+                break
+            del self.rooms[room_id]
+            self.bytes -= sum(size for _, _, size in entries)
+            self.evicted_messages += len(entries)
+            self.evicted_rooms += 1
+
+    def stats(self) -> dict:
+        return {
+            "rooms": len(self.rooms),
+            "messages": sum(len(entries) for _, entries in self.rooms.values()),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "evicted_messages": self.evicted_messages,
+            "evicted_rooms": self.evicted_rooms,
+        }
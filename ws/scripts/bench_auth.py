@@ -0,0 +1,84 @@
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jose import jwt
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from auth import TokenVerifier  # noqa: E402
+from bench_broadcast import FakeWebSocket  # noqa: E402
+from connections import ConnectionManager  # noqa: E402
+
+
+def make_keys():
+    private = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    private_pem = private.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    ).decode()
+    public_pem = (
+        private.public_key()
+        .public_bytes(
+            serialization.Encoding.PEM,
+            serialization.PublicFormat.SubjectPublicKeyInfo,
+        )
+        .decode()
+    )
+    return private_pem, public_pem
+
+
+async def broadcast_loop(verify, tokens, manager, count):
+    # what /broadcast does per request, minus HTTP: authorize, then fan out
+    start = time.perf_counter()
+    for n in range(count):
+        if not verify(tokens[n % len(tokens)]):
+            raise RuntimeError("token rejected")
+        await manager.broadcast_to_room("message", "bench")
+    return count / (time.perf_counter() - start)
+
+
+async def run(args):
+    private_pem, public_pem = make_keys()
+    tokens = [
+        jwt.encode({"sub": f"producer-{i}"}, private_pem, algorithm="RS256")
+        for i in range(args.producers)
+    ]
+
+    manager = ConnectionManager(max_queue=1)
+    for i in range(args.sockets):
+        await manager.connect(FakeWebSocket(i, 0), "bench", "bench")
+
+    def uncached_pem(token):
+        # the old verify_token: PEM string handed to every decode
+        return jwt.decode(token, public_pem, algorithms=["RS256"])
+
+    modes = [
+        ("pem per decode", uncached_pem),
+        ("parsed key", TokenVerifier(public_pem, cache_ttl=0).verify),
+        ("cached", TokenVerifier(public_pem, cache_ttl=300).verify),
+    ]
+
+    print(f"{args.producers} distinct tokens, {args.sockets} sockets in the room")
+    for label, verify in modes:
+        rate = await broadcast_loop(verify, tokens, manager, args.requests)
+        print(f"{label:>15}  {rate:10.0f} broadcasts/s  {1e6 / rate:8.1f} us each")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Broadcast throughput with and without the verified-token cache"
+    )
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--producers", type=int, default=4)
+    parser.add_argument("--sockets", type=int, default=10)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+import argparse
+import asyncio
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from connections import SLOW_CONSUMER_POLICIES, ConnectionManager  # noqa: E402
+
+
+class FakeWebSocket:
+    """Stands in for an overlay; slow ones take ``delay`` seconds per frame."""
+
+    def __init__(self, index, delay):
+        self.client = SimpleNamespace(host=f"10.0.0.{index % 256}")
+        self.delay = delay
+        self.received = 0
+
+    async def accept(self):
+        pass
+
+    async def send(self, message):
+        await self.send_text(message["text"])
+
+    async def send_text(self, message):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.received += 1
+
+    async def close(self, code=None, reason=None):
+        pass
+
+
+async def serial_broadcast(sockets, message):
+    # what ConnectionManager.broadcast_to_room used to do
+    for websocket in sockets:
+        await websocket.send_text(message)
+
+
+def make_sockets(args):
+    return [
+        FakeWebSocket(i, args.slow_delay if i < args.slow else args.fast_delay)
+        for i in range(args.sockets)
+    ]
+
+
+async def run_serial(args):
+    sockets = make_sockets(args)
+    start = time.perf_counter()
+    returned = []
+    for n in range(args.messages):
+        t = time.perf_counter()
+        await serial_broadcast(sockets, f"message {n}")
+        returned.append(time.perf_counter() - t)
+
+    # every socket, fast or slow, is only done once the whole loop is
+    return returned, time.perf_counter() - start
+
+
+async def run_queued(args):
+    manager = ConnectionManager(
+        max_queue=args.queue_size or max(args.messages, 1),
+        policy=args.policy,
+        send_timeout=None,
+    )
+    sockets = make_sockets(args)
+    for websocket in sockets:
+        await manager.connect(websocket, "bench", "bench")
+
+    fast = [ws for ws in sockets if ws.delay != args.slow_delay]
+
+    start = time.perf_counter()
+    returned = []
+    for n in range(args.messages):
+        t = time.perf_counter()
+        await manager.broadcast_to_room(f"message {n}", "bench")
+        returned.append(time.perf_counter() - t)
+
+    room = manager.active_rooms.get("bench", {})
+    await asyncio.gather(*(room[ws].queue.join() for ws in fast if ws in room))
+    fast_delivered = time.perf_counter() - start
+
+    metrics = manager.metrics()
+    print(f"queued: dropped {metrics['dropped']}, evicted {metrics['evicted']}")
+
+    for websocket in sockets:
+        manager.disconnect(websocket, "bench")
+
+    return returned, fast_delivered
+
+
+def report(label, returned, fast_delivered):
+    returned = sorted(returned)
+    p50 = returned[len(returned) // 2] * 1000
+    worst = returned[-1] * 1000
+    print(
+        f"{label:>7}  broadcast p50 {p50:9.3f} ms  max {worst:9.3f} ms  "
+        f"fast sockets done {fast_delivered * 1000:9.1f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare serial and queued fan-out with some slow sockets"
+    )
+    parser.add_argument("--sockets", type=int, default=500)
+    parser.add_argument("--slow", type=int, default=5)
+    parser.add_argument("--slow-delay", type=float, default=0.2)
+    parser.add_argument("--fast-delay", type=float, default=0.0)
+    parser.add_argument("--messages", type=int, default=20)
+    parser.add_argument(
+        "--queue-size",
+        type=int,
+        default=0,
+        help="Per-connection queue size, defaults to --messages so nothing drops",
+    )
+    parser.add_argument(
+        "--policy", choices=SLOW_CONSUMER_POLICIES, default=SLOW_CONSUMER_POLICIES[0]
+    )
+    args = parser.parse_args()
+
+    print(
+        f"{args.sockets} sockets, {args.slow} slow ({args.slow_delay * 1000:.0f} ms "
+        f"per frame), {args.messages} messages"
+    )
+    report("serial", *asyncio.run(run_serial(args)))
+    report("queued", *asyncio.run(run_queued(args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+from starlette.websockets import WebSocket
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import connections  # noqa: E402
+from connections import Connection, ConnectionManager  # noqa: E402
+
+
+class PerSocketConnection(Connection):
+    """The writer as it was before send events were shared: send_text
+    builds an event per socket and each send is wrapped in wait_for."""
+
+    timeout = 10.0
+
+    async def _write(self):
+        while True:
+            frame = await self.queue.get()
+            try:
+                await asyncio.wait_for(
+                    self.websocket.send_text(frame["text"]), self.timeout
+                )
+            finally:
+                self.queue.task_done()
+
+
+def make_websocket(index, events):
+    scope = {
+        "type": "websocket",
+        "path": "/ws/bench",
+        "headers": [],
+        "query_string": b"",
+        "client": (f"10.0.{index // 256 % 256}.{index % 256}", 50000),
+    }
+
+    async def receive():
+        return {"type": "websocket.connect"}
+
+    async def send(message):
+        # stands in for the server's transport write
+        if events is not None and message["type"] == "websocket.send":
+            events.append(message)
+        await asyncio.sleep(0)
+
+    return WebSocket(scope, receive, send)
+
+
+async def run_mode(label, connection_class, args):
+    connections.Connection = connection_class
+    PerSocketConnection.timeout = args.timeout
+
+    # event dicts handed to the transport, held so that distinct ones can
+    # be counted by identity
+    events = []
+
+    manager = ConnectionManager(
+        max_queue=args.messages + args.warmup + 1, send_timeout=args.timeout
+    )
+    await manager.start()
+    for i in range(args.sockets):
+        await manager.connect(make_websocket(i, None), "bench", "bench")
+        await manager.connect(make_websocket(i, events), "counted", "bench")
+
+    async def broadcast(room_id):
+        await manager.broadcast_to_room(message, room_id)
+        room = manager.active_rooms[room_id]
+        await asyncio.gather(*(c.queue.join() for c in room.values()))
+
+    message = "x" * args.size
+    for _ in range(args.warmup):
+        await broadcast("bench")
+
+    start = time.perf_counter()
+    for _ in range(args.messages):
+        await broadcast("bench")
+    elapsed = time.perf_counter() - start
+
+    await broadcast("counted")
+    built = len({id(event) for event in events})
+
+    print(
+        f"{label:>10}  {elapsed / (args.messages * args.sockets) * 1e6:7.2f} us/send"
+        f"  {args.messages / elapsed:8.1f} broadcasts/s"
+        f"  {built} send events per broadcast"
+    )
+
+    for room_id, room in list(manager.active_rooms.items()):
+        for websocket in list(room):
+            manager.disconnect(websocket, room_id)
+    await manager.stop()
+    connections.Connection = Connection
+
+
+async def run(args):
+    print(f"{args.sockets} sockets, {args.size} byte messages")
+    for _ in range(args.rounds):
+        await run_mode("per-socket", PerSocketConnection, args)
+        await run_mode("shared", Connection, args)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Building one send event per socket vs one per broadcast"
+    )
+    parser.add_argument("--sockets", type=int, default=1000)
+    parser.add_argument("--messages", type=int, default=50)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--size", type=int, default=200)
+    parser.add_argument("--timeout", type=float, default=10.0)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backplane import RedisBackplane  # noqa: E402
+from bench_broadcast import FakeWebSocket  # noqa: E402
+from connections import ConnectionManager  # noqa: E402
+from fake_redis import start_server  # noqa: E402
+from replay import ReplayBuffer  # noqa: E402
+
+
+class RecordingWebSocket(FakeWebSocket):
+    def __init__(self, index):
+        super().__init__(index, 0)
+        self.arrivals = asyncio.Queue()
+
+    async def send_text(self, message):
+        await super().send_text(message)
+        self.arrivals.put_nowait(time.perf_counter())
+
+
+async def run(args):
+    server = None
+    url = args.redis_url
+    if not url:
+        server, port = await start_server()
+        url = f"redis://127.0.0.1:{port}/0"
+
+    prefix = f"check:{os.getpid()}:"
+    nodes = [
+        ConnectionManager(
+            backplane=RedisBackplane(url, prefix=prefix, ttl=args.ttl),
+            replay=ReplayBuffer(idle_seconds=args.replay_idle),
+        )
+        for _ in range(args.nodes)
+    ]
+    for node in nodes:
+        await node.start()
+
+    # every node but the first holds sockets, so the first only publishes
+    sockets = []
+    for i in range(args.sockets):
+        websocket = RecordingWebSocket(i)
+        await nodes[1 + i % (args.nodes - 1)].connect(websocket, "room", "check")
+        sockets.append(websocket)
+
+    assert await nodes[0].has_room("room"), "room not visible from publisher"
+    assert not await nodes[0].has_room("missing")
+
+    latencies = []
+    for n in range(args.messages):
+        sent = time.perf_counter()
+        await nodes[0].publish("room", f"message {n}")
+        arrivals = [await ws.arrivals.get() for ws in sockets]
+        latencies.append((max(arrivals) - sent) * 1000)
+
+    print(
+        f"{args.nodes} nodes, {args.sockets} sockets: every socket reached in "
+        f"p50 {statistics.median(latencies):.2f} ms, max {max(latencies):.2f} ms"
+    )
+
+    for i, websocket in enumerate(sockets):
+        nodes[1 + i % (args.nodes - 1)].disconnect(websocket, "room")
+    await asyncio.sleep(0.1)
+    # kept while its replay history is recent, for clients reconnecting
+    assert await nodes[0].has_room("room"), "room dropped before replay went idle"
+
+    # let go by the first heartbeat after the history goes idle
+    await asyncio.sleep(args.replay_idle + args.ttl / 3 + 0.5)
+    assert not await nodes[0].has_room("room"), "room still advertised"
+    print(
+        "membership: room visible across nodes, kept for replay after "
+        "disconnect and gone once idle"
+    )
+
+    for node in nodes:
+        await node.stop()
+    if server is not None:
+        server.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Check cross-node broadcasts through the Redis backplane"
+    )
+    parser.add_argument("--redis-url", help="Defaults to an in-process fake redis")
+    parser.add_argument("--nodes", type=int, default=3)
+    parser.add_argument("--sockets", type=int, default=100)
+    parser.add_argument("--messages", type=int, default=50)
+    parser.add_argument("--ttl", type=float, default=3.0)
+    parser.add_argument("--replay-idle", type=float, default=1.0)
+    args = parser.parse_args()
+    if args.nodes < 2:
+        parser.error("--nodes must be at least 2")
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+import argparse
+import asyncio
+import hashlib
+import os
+import sys
+import time
+
+# Just enough of the Redis protocol for the WS backplane, so multi-node
+# broadcasts can be tried locally without a Redis install. Its Lua scripts
+# are emulated in Python.
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backplane import PUBLISH_SCRIPT  # noqa: E402
+
+
+def encode(value):
+    if value is None:
+        return b"$-1\r\n"
+    if isinstance(value, bool):
+        value = int(value)
+    if isinstance(value, int):
+        return b":%d\r\n" % value
+    if isinstance(value, NoScript):
+        return f"-NOSCRIPT {value}\r\n".encode()
+    if isinstance(value, Exception):
+        return f"-ERR {value}\r\n".encode()
+    if isinstance(value, list):
+        return b"*%d\r\n" % len(value) + b"".join(encode(v) for v in value)
+    if isinstance(value, str):
+        value = value.encode()
+    return b"$%d\r\n%s\r\n" % (len(value), value)
+
+
+class Status(str):
+    pass
+
+
+OK = Status("OK")
+
+
+class NoScript(Exception):
+    pass
+
+
+def sha1(script):
+    if isinstance(script, str):
+        script = script.encode()
+    return hashlib.sha1(script).hexdigest()
+
+
+def parse_score(value):
+    value = value.decode()
+    exclusive = value.startswith("(")
+    if exclusive:
+        value = value[1:]
+    return float(value), exclusive
+
+
+class FakeRedis:
+    def __init__(self):
+        self.zsets = {}
+        self.strings = {}
+        self.expiry = {}
+        self.channels = {}
+        self.scripts = {sha1(PUBLISH_SCRIPT): self._publish_script}
+        self.loaded = set()
+
+    def _expire_keys(self):
+        now = time.time()
+        for key in [k for k, at in self.expiry.items() if at <= now]:
+            self.zsets.pop(key, None)
+            self.strings.pop(key, None)
+            del self.expiry[key]
+
+    def _in_range(self, score, low, high):
+        (lo, lo_ex), (hi, hi_ex) = low, high
+        above = score > lo if lo_ex else score >= lo
+        below = score < hi if hi_ex else score <= hi
+        return above and below
+
+    def publish(self, channel, message):
+        receivers = self.channels.get(channel, set())
+        for writer in list(receivers):
+            writer.write(encode([b"message", channel, message]))
+        return len(receivers)
+
+    def _publish_script(self, keys, args):
+        seq_key, channel = keys
+        initial, ttl, message = args
+        self.command("SET", [seq_key, initial, b"NX", b"EX", ttl], None, None)
+        seq = self.command("INCR", [seq_key], None, None)
+        self.publish(channel, b"%d\n%s" % (seq, message))
+        return seq
+
+    def _eval(self, sha, args):
+        if sha not in self.loaded or sha not in self.scripts:
+            return NoScript("No matching script. Please use EVAL.")
+        count = int(args[0])
+        return self.scripts[sha](args[1 : 1 + count], args[1 + count :])
+
+    def command(self, name, args, writer, subscriptions):
+        self._expire_keys()
+
+        if name == "PING":
+            return Status("PONG")
+        if name in ("CLIENT", "SELECT"):
+            return OK
+        if name == "PUBLISH":
+            return self.publish(args[0], args[1])
+        if name == "SCRIPT" and args[0].upper() == b"LOAD":
+            sha = sha1(args[1])
+            if sha not in self.scripts:
+                return Exception("only the backplane's scripts are supported")
+            self.loaded.add(sha)
+            return sha
+        if name == "EVALSHA":
+            return self._eval(args[0].decode(), args[1:])
+        if name == "EVAL":
+            self.loaded.add(sha1(args[0]))
+            return self._eval(sha1(args[0]), args[1:])
+        if name == "SET":
+            key, value, options = args[0], args[1], [a.upper() for a in args[2:]]
+            if b"NX" in options and key in self.strings:
+                return None
+            self.strings[key] = value
+            if b"EX" in options:
+                seconds = int(options[options.index(b"EX") + 1])
+                self.expiry[key] = time.time() + seconds
+            return OK
+        if name in ("INCR", "INCRBY"):
+            step = int(args[1]) if name == "INCRBY" else 1
+            value = int(self.strings.get(args[0], 0)) + step
+            self.strings[args[0]] = str(value).encode()
+            return value
+        if name == "ZADD":
+            key, rest = args[0], list(args[1:])
+            flags = set()
+            while rest and rest[0].upper() in (b"GT", b"LT", b"NX", b"XX", b"CH"):
+                flags.add(rest.pop(0).upper())
+            zset = self.zsets.setdefault(key, {})
+            added = 0
+            for score, member in zip(rest[::2], rest[1::2]):
+                score = float(score)
+                if member not in zset:
+                    added += 1
+                    zset[member] = score
+                elif b"GT" in flags:
+                    zset[member] = max(zset[member], score)
+                else:
+                    zset[member] = score
+            return added
+        if name == "ZREM":
+            zset = self.zsets.get(args[0], {})
+            return sum(zset.pop(member, None) is not None for member in args[1:])
+        if name == "ZCOUNT":
+            zset = self.zsets.get(args[0], {})
+            low, high = parse_score(args[1]), parse_score(args[2])
+            return sum(self._in_range(s, low, high) for s in zset.values())
+        if name == "ZRANGEBYSCORE":
+            zset = self.zsets.get(args[0], {})
+            low, high = parse_score(args[1]), parse_score(args[2])
+            return [
+                m
+                for m, s in sorted(zset.items(), key=lambda item: item[1])
+                if self._in_range(s, low, high)
+            ]
+        if name == "ZREMRANGEBYSCORE":
+            zset = self.zsets.get(args[0], {})
+            low, high = parse_score(args[1]), parse_score(args[2])
+            doomed = [m for m, s in zset.items() if self._in_range(s, low, high)]
+            for member in doomed:
+                del zset[member]
+            return len(doomed)
+        if name == "EXPIRE":
+            if args[0] not in self.zsets and args[0] not in self.strings:
+                return 0
+            self.expiry[args[0]] = time.time() + int(args[1])
+            return 1
+        if name in ("SUBSCRIBE", "UNSUBSCRIBE"):
+            replies = []
+            for channel in args:
+                if name == "SUBSCRIBE":
+                    self.channels.setdefault(channel, set()).add(writer)
+                    subscriptions.add(channel)
+                else:
+                    self.channels.get(channel, set()).discard(writer)
+                    subscriptions.discard(channel)
+                replies.append(
+                    encode([name.lower().encode(), channel, len(subscriptions)])
+                )
+            return b"".join(replies)
+
+        return Exception(f"unknown command '{name}'")
+
+    async def handle(self, reader, writer):
+        subscriptions = set()
+        try:
+            while True:
+                args = await read_command(reader)
+                if args is None:
+                    break
+
+                name = args[0].decode().upper()
+                reply = self.command(name, args[1:], writer, subscriptions)
+
+                if isinstance(reply, bytes):
+                    writer.write(reply)
+                elif isinstance(reply, Status):
+                    writer.write(f"+{reply}\r\n".encode())
+                else:
+                    writer.write(encode(reply))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            for channel in subscriptions:
+                self.channels.get(channel, set()).discard(writer)
+            writer.close()
+
+
+async def read_command(reader):
+    line = await reader.readline()
+    if not line:
+        return None
+    if not line.startswith(b"*"):
+        return line.split()
+
+    args = []
+    for _ in range(int(line[1:])):
+        size = int((await reader.readline())[1:])
+        args.append((await reader.readexactly(size + 2))[:-2])
+    return args
+
+
+async def start_server(host="127.0.0.1", port=0):
+    fake = FakeRedis()
+    server = await asyncio.start_server(fake.handle, host, port)
+    return server, server.sockets[0].getsockname()[1]
+
+
+async def serve(host, port):
+    server, port = await start_server(host, port)
+    print(f"Fake redis listening, export WS_REDIS_URL=redis://{host}:{port}/0")
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Minimal Redis stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6379)
+    args = parser.parse_args()
+    asyncio.run(serve(args.host, args.port))
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# the server's modules import each other by name, as when run from ws/
+WS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, WS_DIR)
+sys.path.insert(0, os.path.join(WS_DIR, "scripts"))
@@ -0,0 +1,122 @@
+import asyncio
+import json
+
+import pytest
+
+from bench_broadcast import FakeWebSocket
+from connections import DISCONNECT, DROP_NEWEST, DROP_OLDEST, ConnectionManager
+
+
+class BlockedWebSocket(FakeWebSocket):
+    """Holds every send until ``gate`` is set, so its queue fills up."""
+
+    def __init__(self, index=0):
+        super().__init__(index, 0)
+        self.gate = asyncio.Event()
+        self.frames = []
+
+    async def send(self, message):
+        await self.gate.wait()
+        self.frames.append(message["text"])
+
+
+class FailingWebSocket(FakeWebSocket):
+    async def send(self, message):
+        raise ConnectionError("gone")
+
+
+async def fill(policy):
+    manager = ConnectionManager(max_queue=2, policy=policy, send_timeout=None)
+    websocket = BlockedWebSocket()
+    await manager.connect(websocket, "room", "sub")
+
+    # no await in between, so the writer has not taken anything yet
+    delivered = [await manager.broadcast_to_room(f"m{n}", "room") for n in range(5)]
+    metrics = manager.room_metrics("room")
+
+    websocket.gate.set()
+    await asyncio.sleep(0.01)
+    return manager, websocket, delivered, metrics
+
+
+def test_drop_oldest_keeps_the_newest_messages():
+    manager, websocket, delivered, metrics = asyncio.run(fill(DROP_OLDEST))
+
+    assert delivered == [1, 1, 1, 1, 1]
+    assert metrics["dropped"] == 3
+    assert manager.metrics()["dropped"] == 3
+    assert websocket.frames == ["m3", "m4"]
+    assert manager.total_evicted == 0
+
+
+def test_drop_newest_keeps_the_oldest_messages():
+    manager, websocket, delivered, metrics = asyncio.run(fill(DROP_NEWEST))
+
+    assert delivered == [1, 1, 0, 0, 0]
+    assert metrics["dropped"] == 3
+    assert websocket.frames == ["m0", "m1"]
+    assert manager.total_evicted == 0
+
+
+def test_disconnect_evicts_when_the_queue_is_full():
+    manager, websocket, delivered, metrics = asyncio.run(fill(DISCONNECT))
+
+    assert delivered == [1, 1, 0, 0, 0]
+    # evicted on the first message that did not fit, nothing was dropped
+    assert metrics is None
+    assert websocket.frames == []
+    assert manager.total_dropped == 0
+    assert manager.total_evicted == 1
+    assert "room" not in manager.active_rooms
+
+
+def test_failed_send_evicts():
+    async def run():
+        manager = ConnectionManager(send_timeout=None)
+        await manager.connect(FailingWebSocket(0, 0), "room", "sub")
+        healthy = FakeWebSocket(1, 0)
+        await manager.connect(healthy, "room", "sub")
+
+        await manager.broadcast_to_room("hello", "room")
+        await asyncio.sleep(0.01)
+        return manager, healthy
+
+    manager, healthy = asyncio.run(run())
+
+    assert manager.total_evicted == 1
+    assert list(manager.active_rooms["room"]) == [healthy]
+    assert healthy.received == 1
+
+
+def test_reconnect_replays_only_messages_after_since():
+    async def run():
+        manager = ConnectionManager(send_timeout=None)
+        first = BlockedWebSocket()
+        first.gate.set()
+        await manager.connect(first, "room", "sub", envelope=True)
+
+        await manager.publish("room", "one")
+        await asyncio.sleep(0.01)
+        last_seen = json.loads(first.frames[-1])["seq"]
+        manager.disconnect(first, "room")
+
+        # nobody is connected, the room is kept for the reconnect
+        assert await manager.has_room("room")
+        await manager.publish("room", "two")
+        await manager.publish("room", "three")
+
+        again = BlockedWebSocket()
+        again.gate.set()
+        await manager.connect(again, "room", "sub", since=last_seen)
+        await asyncio.sleep(0.01)
+        return [json.loads(frame) for frame in again.frames], last_seen
+
+    frames, last_seen = asyncio.run(run())
+
+    assert [frame["message"] for frame in frames] == ["two", "three"]
+    assert [frame["seq"] for frame in frames] == [last_seen + 1, last_seen + 2]
+
+
+def test_unknown_policy_is_rejected():
+    with pytest.raises(ValueError):
+        ConnectionManager(policy="drop-everything")
@@ -0,0 +1,96 @@
+import pytest
+
+import replay
+from replay import ReplayBuffer
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture()
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(replay.time, "monotonic", clock)
+    return clock
+
+
+def frame(seq):
+    return {"type": "websocket.send", "text": str(seq)}
+
+
+def test_since_returns_only_later_entries():
+    buffer = ReplayBuffer(room_messages=3)
+    for seq in range(1, 6):
+        buffer.append("room", seq, frame(seq), 10)
+
+    # capped at room_messages, the oldest went first
+    assert buffer.since("room", 0) == [frame(3), frame(4), frame(5)]
+    assert buffer.since("room", 3) == [frame(4), frame(5)]
+    assert buffer.since("room", 5) == []
+    assert buffer.since("other", 0) == []
+    assert buffer.stats()["evicted_messages"] == 2
+
+
+def test_stale_sequence_numbers_are_ignored():
+    buffer = ReplayBuffer()
+    buffer.append("room", 2, frame(2), 10)
+    buffer.append("room", 2, frame(2), 10)
+    buffer.append("room", 1, frame(1), 10)
+
+    assert buffer.since("room", 0) == [frame(2)]
+    assert buffer.stats()["bytes"] == 10
+
+
+def test_bytes_are_trimmed_from_the_least_recently_active_room(clock):
+    buffer = ReplayBuffer(room_messages=10, max_bytes=100)
+    buffer.append("old", 1, frame(1), 40)
+    clock.now += 1
+    buffer.append("new", 1, frame(1), 40)
+    clock.now += 1
+    buffer.append("new", 2, frame(2), 40)
+
+    assert buffer.since("old", 0) == []
+    assert buffer.since("new", 0) == [frame(1), frame(2)]
+    assert buffer.stats() == {
+        "rooms": 1,
+        "messages": 2,
+        "bytes": 80,
+        "max_bytes": 100,
+        "evicted_messages": 1,
+        "evicted_rooms": 1,
+    }
+
+
+def test_idle_rooms_are_dropped(clock):
+    buffer = ReplayBuffer(idle_seconds=300)
+    buffer.append("idle", 1, frame(1), 10)
+    buffer.touch("away")
+
+    clock.now += 200
+    buffer.append("busy", 1, frame(1), 10)
+    assert buffer.is_recent("idle")
+    assert list(buffer.recent_rooms()) == ["busy", "away", "idle"]
+
+    clock.now += 200
+    assert not buffer.is_recent("idle")
+    assert list(buffer.recent_rooms()) == ["busy"]
+
+    buffer.append("busy", 2, frame(2), 10)
+    assert buffer.since("idle", 0) == []
+    assert buffer.stats()["rooms"] == 1
+    assert buffer.stats()["bytes"] == 20
+    assert buffer.stats()["evicted_rooms"] == 2
+
+
+def test_disabled_buffer_keeps_nothing():
+    buffer = ReplayBuffer(room_messages=0)
+    buffer.append("room", 1, frame(1), 10)
+    buffer.touch("room")
+
+    assert buffer.since("room", 0) == []
+    assert not buffer.is_recent("room")